@@ -0,0 +1,8 @@
+"""Performance benchmarks for py_opening_hours
+
+Benchmarks are written in the style of asv: classes with an optional
+`setup` method and any number of `time_*` methods. Run them with
+
+    python -m benchmarks run --save NAME
+    python -m benchmarks compare BASELINE NAME
+"""
@@ -0,0 +1,134 @@
+"""Run benchmarks and compare results
+
+    python -m benchmarks run [-k PATTERN] [--save NAME]
+    python -m benchmarks compare BASELINE [NAME] [--threshold RATIO]
+
+Results are stored as json in benchmarks/results/NAME.json. `compare`
+exits with status 1 if any benchmark is slower than the baseline by more
+than the threshold ratio; without NAME the benchmarks are run afresh.
+"""
+import argparse
+import inspect
+import json
+import platform
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+import py_opening_hours
+from . import suite
+
+RESULTS = Path(__file__).parent / "results"
+REPEAT = 5
+
+
+def benchmarks() -> Iterable[Tuple[str, type, str]]:
+    for class_name, cls in inspect.getmembers(suite, inspect.isclass):
+        if cls.__module__ != suite.__name__:
+            continue
+        for method_name, _ in inspect.getmembers(cls, inspect.isfunction):
+            if method_name.startswith("time_"):
+                yield f"{class_name}.{method_name}", cls, method_name
+
+
+def time_benchmark(cls: type, method_name: str) -> Dict[str, float]:
+    instance = cls()
+    if hasattr(instance, "setup"):
+        instance.setup()
+    timer = timeit.Timer(getattr(instance, method_name))
+    # enough calls to take at least 0.2 seconds
+    number, _ = timer.autorange()
+    timings = [t / number for t in timer.repeat(repeat=REPEAT, number=number)]
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "number": number,
+    }
+
+
+def run(pattern: str = None) -> Dict:
+    results = {}
+    for name, cls, method_name in benchmarks():
+        if pattern and pattern not in name:
+            continue
+        results[name] = time_benchmark(cls, method_name)
+        print(f"{name:<40} {format_seconds(results[name]['min'])}", flush=True)
+    return {
+        "version": py_opening_hours.__version__,
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> bool:
+    """Print a comparison table, returning False if anything regressed"""
+    ok = True
+    print(f"{'benchmark':<40} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, result in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<40} {'-':>10} {format_seconds(result['min']):>10}")
+            continue
+        ratio = result["min"] / base["min"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  slower"
+            ok = False
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(
+            f"{name:<40} {format_seconds(base['min']):>10} "
+            f"{format_seconds(result['min']):>10} {ratio:>7.2f}{flag}"
+        )
+    return ok
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def load(name: str) -> Dict:
+    with open(RESULTS / f"{name}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(name: str, results: Dict) -> None:
+    RESULTS.mkdir(exist_ok=True)
+    with open(RESULTS / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-k", dest="pattern", help="only run matching benchmarks")
+    run_parser.add_argument("--save", metavar="NAME", help="store results as NAME")
+    compare_parser = commands.add_parser("compare", help="compare against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("name", nargs="?")
+    compare_parser.add_argument(
+        "-k", dest="pattern", help="only run matching benchmarks"
+    )
+    compare_parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run(args.pattern)
+        if args.save:
+            save(args.save, results)
+        return 0
+    baseline = load(args.baseline)
+    current = load(args.name) if args.name else run(args.pattern)
+    return 0 if compare(baseline, current, args.threshold) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Benchmark scenarios
+
+Every `time_*` method is a benchmark named `<Class>.<method>`, timed
+after the class' `setup` has run.
+"""
+import datetime as dt
+from pathlib import Path
+from typing import List
+
+from astral import LocationInfo
+
+from py_opening_hours import codegen, syntax, OpenHours
+from py_opening_hours import data_structures as ds
+from py_opening_hours import datetime_utils as dt_utils
+
+CORPUS = Path(__file__).parent / "corpus.txt"
+
+PITTSBURGH = LocationInfo(
+    "Pittsburgh", "PA", "America/New_York", 40.44127718642986, -80.00144481122433
+)
+
+SIMPLE = "Mo-Fr 09:00-17:00"
+TYPICAL = "Mo-Fr 08:00-12:00,13:00-17:30; Sa 08:00-12:00; PH off"
+COMPLEX = (
+    "00:00-23:59; Tu-Su,PH 08:30-09:00 off; Tu-Su 14:00-14:30 off; "
+    "Mo 08:00-13:00 off; Sa[1],Sa[-1] 10:00-12:00 open; week 2-52/2 We off"
+)
+SUN = "Mo-Fr sunrise-sunset; Sa-Su 11:00-sunset; PH off"
+
+
+def corpus() -> List[str]:
+    with open(CORPUS, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def hourly(year: int) -> List[dt.datetime]:
+    start = dt.datetime(year, 1, 1)
+    end = dt.datetime(year + 1, 1, 1)
+    hours = int((end - start) / dt.timedelta(hours=1))
+    return [start + dt.timedelta(hours=h) for h in range(hours)]
+
+
+def daily(year: int) -> List[dt.date]:
+    start = dt.date(year, 1, 1)
+    return [
+        start + dt.timedelta(days=d)
+        for d in range((dt.date(year + 1, 1, 1) - start).days)
+    ]
+
+
+class Parse:
+    def setup(self):
+        self.corpus = corpus()
+
+    def time_parse_simple(self):
+        syntax.parse(SIMPLE)
+
+    def time_parse_complex(self):
+        syntax.parse(COMPLEX)
+
+    def time_parse_corpus(self):
+        for s in self.corpus:
+            syntax.parse(s)
+
+
+class Evaluate:
+    def setup(self):
+        self.simple = OpenHours.from_string(SIMPLE)
+        self.typical = OpenHours.from_string(TYPICAL)
+        self.complex = OpenHours.from_string(COMPLEX)
+        self.datetime = dt.datetime(2022, 6, 6, 11, 0)
+        self.year = hourly(2022)
+
+    def time_evaluate_simple(self):
+        self.simple.evaluate(self.datetime)
+
+    def time_evaluate_typical(self):
+        self.typical.evaluate(self.datetime)
+
+    def time_evaluate_complex(self):
+        self.complex.evaluate(self.datetime)
+
+    def time_year_sweep_typical(self):
+        for datetime in self.year:
+            self.typical.evaluate(datetime)
+
+    def time_year_sweep_complex(self):
+        for datetime in self.year:
+            self.complex.evaluate(datetime)
+
+
+class Compiled:
+    def setup(self):
+        self.typical = OpenHours.from_string(TYPICAL).compile()
+        self.complex = OpenHours.from_string(COMPLEX).compile()
+        self.datetime = dt.datetime(2022, 6, 6, 11, 0)
+        self.year = hourly(2022)
+        self.corpus = [OpenHours.from_string(s) for s in corpus()]
+
+    def time_compile_corpus(self):
+        codegen.COMPILED.clear()
+        for hours in self.corpus:
+            hours.compile()
+
+    def time_evaluate_typical(self):
+        self.typical(self.datetime, None)
+
+    def time_evaluate_complex(self):
+        self.complex(self.datetime, None)
+
+    def time_year_sweep_typical(self):
+        for datetime in self.year:
+            self.typical(datetime, None)
+
+    def time_year_sweep_complex(self):
+        for datetime in self.year:
+            self.complex(datetime, None)
+
+
+class Sun:
+    def setup(self):
+        self.hours = OpenHours.from_string(SUN)
+        self.days = daily(2022)
+        self.month = [d for d in hourly(2022) if d.month == 6]
+
+    def time_event_to_datetime(self):
+        for date in self.days:
+            ds.Event.sunrise.to_datetime(date, PITTSBURGH)
+
+    def time_month_sweep(self):
+        for datetime in self.month:
+            self.hours.evaluate(datetime, PITTSBURGH)
+
+
+class Holidays:
+    def setup(self):
+        self.public = ds.Holiday(ds.HolidayType.public, 0)
+        self.offset = ds.Holiday(ds.HolidayType.public, 1)
+        self.hours = OpenHours.from_string("Mo-Su 10:00-20:00; PH off; PH +1 day off")
+        self.days = daily(2022)
+        self.year = hourly(2022)
+        # exclude the one off expansion of the holiday calendar
+        dt_utils.get_holiday_dates("US", None, 2022)
+
+    def time_holiday_contains(self):
+        for date in self.days:
+            self.public.contains(date)
+            self.offset.contains(date)
+
+    def time_year_sweep(self):
+        for datetime in self.year:
+            self.hours.evaluate(datetime)
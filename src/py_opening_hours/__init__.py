@@ -1,5 +1,5 @@
 __version__ = "0.1.0"
 from .evaluate import OpenHours, evaluate  # noqa
-from .syntax import parse  # noqa
+from .syntax import parse, is_valid, try_parse  # noqa
 from .data_structures import RuleStatus, RuleModifier  # noqa
 from astral import LocationInfo  # noqa
@@ -0,0 +1,239 @@
+"""Set operations on opening hours
+
+`union`, `intersection`, `difference` and `complement` combine schedules
+into a `CombinedHours`, which evaluates like `OpenHours` from the day
+segments of its operands, combined once per date: answering a combined
+query at many timestamps costs one lookup each rather than an evaluation
+of every operand.
+
+Statuses combine in three valued logic, unknown standing for either open
+or closed: the union is open if any operand is open and the intersection
+is closed if any operand is closed, otherwise unknown if any operand is.
+The complement swaps open and closed. Comments are not kept.
+
+The result cannot in general be written as rules, e.g. the complement of
+"09:00-17:00" opens one microsecond after 17:00, so it is not symbolic.
+When every operand only depends on the weekday (see `analysis.FastPath`)
+the combined segments are computed once per weekday instead of per date.
+"""
+import bisect
+import datetime as dt
+import threading
+from collections import deque
+from enum import Enum
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Union
+
+from astral import LocationInfo
+
+from . import datetime_utils as dt_utils
+from .analysis import FastPath
+from .common import StripedLock, compute_once
+from .data_structures import RuleModifier, RuleStatus, ONE_DAY
+from .evaluate import (
+    HORIZON,
+    Interval,
+    OpenHours,
+    Segment,
+    WEEKLY_HORIZON,
+    first_change,
+    materialize,
+    open_during,
+    open_throughout,
+    time_open,
+    walk,
+)
+from .timeline import Timeline
+
+# combined day segments kept per schedule, for operands depending on the date
+DAYS_CACHED = 400
+DAY_LOCKS = StripedLock()
+
+
+class Operation(Enum):
+    union = "union"
+    intersection = "intersection"
+    difference = "difference"
+    complement = "complement"
+
+
+Hours = Union[OpenHours, "CombinedHours"]
+
+OPEN = RuleModifier(RuleStatus.open, None)
+CLOSED = RuleModifier(RuleStatus.closed, None)
+UNKNOWN = RuleModifier(RuleStatus.unknown, None)
+NEGATION = {
+    RuleStatus.open: RuleStatus.closed,
+    RuleStatus.closed: RuleStatus.open,
+    RuleStatus.unknown: RuleStatus.unknown,
+}
+MODIFIERS = {
+    RuleStatus.open: OPEN,
+    RuleStatus.closed: CLOSED,
+    RuleStatus.unknown: UNKNOWN,
+}
+
+
+def combine(operation: Operation, statuses: Sequence[RuleStatus]) -> RuleStatus:
+    """The status of the operation applied to its operands' statuses"""
+    if operation is Operation.complement:
+        return NEGATION[statuses[0]]
+    if operation is Operation.difference:
+        statuses = [statuses[0]] + [NEGATION[s] for s in statuses[1:]]
+    if operation is Operation.union:
+        absorbing, identity = RuleStatus.open, RuleStatus.closed
+    else:
+        absorbing, identity = RuleStatus.closed, RuleStatus.open
+    if absorbing in statuses:
+        return absorbing
+    if RuleStatus.unknown in statuses:
+        return RuleStatus.unknown
+    return identity
+
+
+def combine_segments(
+    operation: Operation, operands: Sequence[List[Segment]]
+) -> List[Segment]:
+    """Combine the day segments of each operand into those of the operation"""
+    bounds = sorted({segment.start for segments in operands for segment in segments})
+    positions = [0] * len(operands)
+    result = []
+    for start in bounds:
+        statuses = []
+        for i, segments in enumerate(operands):
+            while segments[positions[i]].end <= start:
+                positions[i] += 1
+            statuses.append(segments[positions[i]].modifier.status)
+        modifier = MODIFIERS[combine(operation, statuses)]
+        if result and result[-1].modifier == modifier:
+            continue
+        if result:
+            result[-1] = result[-1]._replace(end=start)
+        result.append(Segment(start, ONE_DAY, modifier))
+    return result
+
+
+def is_weekly(hours: Hours) -> bool:
+    """Whether the day segments of hours only depend on the weekday"""
+    if isinstance(hours, CombinedHours):
+        return hours.weekly
+    return hours.analyze().fast_path in (FastPath.constant, FastPath.weekly)
+
+
+class CombinedHours:
+    def __init__(self, operation: Operation, operands: Sequence[Hours]) -> None:
+        self.operation = operation
+        self.operands = list(operands)
+        self.weekly = all(is_weekly(hours) for hours in self.operands)
+        # (weekday, or date and location key, closed) -> combined day segments
+        self.cache: Dict[object, List[Segment]] = {}
+        # the cached keys, in the order they were computed
+        self.keys: Deque[object] = deque()
+        self.evicting = threading.Lock()
+
+    def day_segments(
+        self, date: dt.date, loc: LocationInfo = None, closed: bool = True
+    ) -> List[Segment]:
+        if self.weekly:
+            key = (date.weekday(), closed)
+        else:
+            key = (date, None if loc is None else dt_utils.sun_key(loc), closed)
+
+        computed = []
+
+        def compute():
+            computed.append(key)
+            return combine_segments(
+                self.operation,
+                [hours.day_segments(date, loc, closed) for hours in self.operands],
+            )
+
+        segments = compute_once(self.cache, DAY_LOCKS, key, compute)
+        if computed:
+            with self.evicting:
+                self.keys.append(key)
+                while len(self.keys) > DAYS_CACHED:
+                    # the oldest first
+                    self.cache.pop(self.keys.popleft(), None)
+        return segments
+
+    def segments(
+        self, loc: LocationInfo, closed: bool = True
+    ) -> Callable[[dt.date], List[Segment]]:
+        return lambda date: self.day_segments(date, loc, closed)
+
+    def evaluate(self, datetime: dt.datetime, loc: LocationInfo = None) -> RuleModifier:
+        segments = self.day_segments(datetime.date(), loc)
+        offset = datetime - dt.datetime.combine(datetime.date(), dt.time())
+        starts = [segment.start for segment in segments]
+        return segments[bisect.bisect_right(starts, offset) - 1].modifier
+
+    def intervals(
+        self, start: dt.datetime, end: dt.datetime, loc: LocationInfo = None
+    ) -> Iterator[Interval]:
+        return walk(self.segments(loc), start, end)
+
+    def next_change(
+        self,
+        datetime: dt.datetime,
+        loc: LocationInfo = None,
+        horizon: dt.timedelta = None,
+    ) -> Optional[Interval]:
+        horizon = horizon or HORIZON
+        if self.weekly:
+            horizon = min(horizon, WEEKLY_HORIZON)
+        return first_change(self.segments(loc), datetime, horizon)
+
+    def is_open_throughout(
+        self, start: dt.datetime, end: dt.datetime, loc: LocationInfo = None
+    ) -> bool:
+        return open_throughout(self.segments(loc), start, end)
+
+    def is_open_during(
+        self, start: dt.datetime, end: dt.datetime, loc: LocationInfo = None
+    ) -> bool:
+        return open_during(self.segments(loc), start, end)
+
+    def open_duration(
+        self, start: dt.datetime, end: dt.datetime, loc: LocationInfo = None
+    ) -> dt.timedelta:
+        return time_open(self.segments(loc, closed=False), start, end)
+
+    def materialize(
+        self,
+        year: int,
+        loc: LocationInfo = None,
+        resolution: dt.timedelta = dt.timedelta(minutes=1),
+    ) -> Timeline:
+        return materialize(self.segments(loc), year, resolution)
+
+    def __or__(self, other: Hours) -> "CombinedHours":
+        return union(self, other)
+
+    def __and__(self, other: Hours) -> "CombinedHours":
+        return intersection(self, other)
+
+    def __sub__(self, other: Hours) -> "CombinedHours":
+        return difference(self, other)
+
+    def __invert__(self) -> "CombinedHours":
+        return complement(self)
+
+
+def union(hours: Hours, *others: Hours) -> CombinedHours:
+    """Open whenever any of the schedules is open"""
+    return CombinedHours(Operation.union, (hours,) + others)
+
+
+def intersection(hours: Hours, *others: Hours) -> CombinedHours:
+    """Open whenever all of the schedules are open"""
+    return CombinedHours(Operation.intersection, (hours,) + others)
+
+
+def difference(hours: Hours, *others: Hours) -> CombinedHours:
+    """Open whenever the first schedule is open and none of the others are"""
+    return CombinedHours(Operation.difference, (hours,) + others)
+
+
+def complement(hours: Hours) -> CombinedHours:
+    """Open whenever the schedule is closed, and the other way around"""
+    return CombinedHours(Operation.complement, [hours])
@@ -0,0 +1,128 @@
+"""Static analysis of the evaluation cost of opening hours rules"""
+from enum import Enum
+from typing import FrozenSet, Iterable, NamedTuple, Set
+
+from . import data_structures as ds
+
+
+class Feature(Enum):
+    always = "always"
+    years = "years"
+    monthdays = "monthdays"
+    easter = "easter"
+    weeks = "weeks"
+    weekdays = "weekdays"
+    nth_weekdays = "nth_weekdays"
+    public_holidays = "public_holidays"
+    school_holidays = "school_holidays"
+    times = "times"
+    sun_events = "sun_events"
+
+
+class CostClass(Enum):
+    """How evaluation depends on the datetime, from cheapest to dearest"""
+
+    # depends only on the weekday and time of day
+    static = 1
+    # depends on the date through weeks, years, monthdays or nth weekdays
+    calendar = 2
+    # depends on the holiday calendar of a region
+    holiday = 3
+    # depends on the location through sun events
+    location = 4
+
+
+class FastPath(Enum):
+    # the same status at all times
+    constant = "constant"
+    # a table of status segments per weekday
+    weekly = "weekly"
+    # status segments per date, independent of location
+    daily = "daily"
+    # status segments per date and location
+    general = "general"
+
+
+class Dependency(Enum):
+    location = "location"
+    region = "region"
+
+
+class Analysis(NamedTuple):
+    cost: CostClass
+    fast_path: FastPath
+    dependencies: FrozenSet[Dependency]
+    features: FrozenSet[Feature]
+
+
+CALENDAR_FEATURES = {
+    Feature.years,
+    Feature.monthdays,
+    Feature.easter,
+    Feature.weeks,
+    Feature.nth_weekdays,
+}
+HOLIDAY_FEATURES = {Feature.public_holidays, Feature.school_holidays}
+VARIABLE_FEATURES = {Feature.weekdays, Feature.times} | CALENDAR_FEATURES
+
+
+def selector_features(selector: ds.TimeSelector) -> Set[Feature]:
+    if selector.always:
+        return {Feature.always}
+    features = set()
+    if selector.years is not None:
+        features.add(Feature.years)
+    if selector.monthdays is not None:
+        features.add(Feature.monthdays)
+        dates = (selector.monthdays.start, selector.monthdays.end)
+        if any(d is not None and d.special is not None for d in dates):
+            features.add(Feature.easter)
+    if selector.weeks is not None:
+        features.add(Feature.weeks)
+    if selector.weekdays is not None:
+        for span in selector.weekdays.weekdays or []:
+            features.add(Feature.nth_weekdays if span.every else Feature.weekdays)
+        for holiday in selector.weekdays.holidays or []:
+            if holiday.type is ds.HolidayType.public:
+                features.add(Feature.public_holidays)
+            else:
+                features.add(Feature.school_holidays)
+    if selector.times is not None:
+        features.add(Feature.times)
+        for span in selector.times:
+            ends = (span.start, span.end)
+            if any(t is not None and t.vtime is not None for t in ends):
+                features.add(Feature.sun_events)
+    return features
+
+
+def analyze(rules: Iterable[ds.Rule]) -> Analysis:
+    """Classify the evaluation cost of rules and what they depend on."""
+    rules = list(rules)
+    features = set()
+    for rule in rules:
+        features |= selector_features(rule.time_selector)
+    dependencies = set()
+    if Feature.sun_events in features:
+        dependencies.add(Dependency.location)
+    if features & HOLIDAY_FEATURES:
+        dependencies.add(Dependency.region)
+
+    if Feature.sun_events in features:
+        cost = CostClass.location
+    elif features & HOLIDAY_FEATURES:
+        cost = CostClass.holiday
+    elif features & CALENDAR_FEATURES:
+        cost = CostClass.calendar
+    else:
+        cost = CostClass.static
+
+    if not features & (VARIABLE_FEATURES | HOLIDAY_FEATURES):
+        fast_path = FastPath.constant
+    elif cost is CostClass.static:
+        fast_path = FastPath.weekly
+    elif cost is CostClass.location:
+        fast_path = FastPath.general
+    else:
+        fast_path = FastPath.daily
+    return Analysis(cost, fast_path, frozenset(dependencies), frozenset(features))
@@ -0,0 +1,121 @@
+"""Canonical forms of opening hours rules
+
+Rules that evaluate identically often differ syntactically, e.g.
+"Mo-Fr 09:00-17:00" and "Mo,Tu,We,Th,Fr 09:00-17:00". `canonicalize`
+rewrites parsed rules into a canonical form that evaluates the same as
+the original rules, and `fingerprint` hashes that form so that it can
+key caches shared by equivalent strings.
+"""
+import hashlib
+from typing import Iterable, List
+
+from . import data_structures as ds
+
+DAYS = list(ds.DayOfWeek)
+
+
+def unique(items: Iterable) -> List:
+    """Drop repeated items, keeping the first occurrence"""
+    seen = []
+    for item in items:
+        if item not in seen:
+            seen.append(item)
+    return seen
+
+
+def canonical_weekdays(spans: List[ds.WeekdaySpan]) -> List[ds.WeekdaySpan]:
+    """Merge plain weekdays and ranges into maximal (circular) ranges"""
+    days = set()
+    nth = []
+    for span in spans:
+        if span.end is not None:
+            days.update(span.start.until(span.end))
+        elif span.every:
+            nth.append(span)
+        else:
+            days.add(span.start)
+    if len(days) == len(DAYS):
+        ranges = [ds.WeekdaySpan(ds.DayOfWeek.Mo, ds.DayOfWeek.Su, (), 0)]
+    else:
+        ranges = []
+        for day in DAYS:
+            if day not in days or DAYS[day.value - 1] in days:
+                continue
+            end = day
+            while end.tomorrow() in days:
+                end = end.tomorrow()
+            ranges.append(ds.WeekdaySpan(day, None if end is day else end, (), 0))
+    return ranges + sorted(unique(nth), key=repr)
+
+
+def canonical_times(spans: List[ds.TimeSpan]) -> List[ds.TimeSpan]:
+    """Sort and merge overlapping fixed time spans
+
+    Spans ending before they start carry over into the next day and are
+    written with extended times, e.g. 22:00-02:00 as 22:00-26:00.
+    """
+    fixed = []
+    others = []
+    for span in spans:
+        if (
+            span.end is not None
+            and span.start.time is not None
+            and span.end.time is not None
+            and not span.open_end
+            and span.every is None
+        ):
+            start, end = span.start.time, span.end.time
+            if end < start:
+                end = ds.Time(end.hour + 24, end.minute)
+            fixed.append((start, end))
+        else:
+            others.append(span)
+    merged = []
+    for start, end in sorted(fixed):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return [
+        ds.TimeSpan(
+            ds.ExtendedTime.from_time(start),
+            ds.ExtendedTime.from_time(end),
+            False,
+            None,
+        )
+        for start, end in merged
+    ] + sorted(unique(others), key=repr)
+
+
+def canonical_selector(selector: ds.TimeSelector) -> ds.TimeSelector:
+    if selector.always:
+        return ds.TimeSelector(True, None, None, None, None, None, None)
+    weekdays = selector.weekdays
+    if weekdays is not None:
+        weekdays = ds.WeekdaySelector(
+            canonical_weekdays(weekdays.weekdays) if weekdays.weekdays else None,
+            sorted(unique(weekdays.holidays), key=repr) if weekdays.holidays else None,
+        )
+    return selector._replace(
+        years=sorted(unique(selector.years), key=repr) if selector.years else None,
+        weeks=sorted(unique(selector.weeks), key=repr) if selector.weeks else None,
+        weekdays=weekdays,
+        times=canonical_times(selector.times) if selector.times else None,
+    )
+
+
+def canonicalize(rules: Iterable[ds.Rule]) -> List[ds.Rule]:
+    """Rewrite rules into a canonical form which evaluates identically.
+
+    Selectors are normalized and rules repeating an earlier rule are
+    dropped, as they can never change the result of `evaluate`.
+    """
+    return unique(
+        ds.Rule(canonical_selector(rule.time_selector), rule.modifier) for rule in rules
+    )
+
+
+def fingerprint(rules: Iterable[ds.Rule]) -> str:
+    """A stable hash of the canonical form of rules"""
+    text = repr(canonicalize(rules))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
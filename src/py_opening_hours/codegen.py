@@ -0,0 +1,207 @@
+"""Compile rules into specialized evaluation functions
+
+`compile_rules` generates the source of a function evaluating a list of
+rules, with the selectors inlined as comparisons against constants, and
+compiles it. The function gives the same result as `evaluate.evaluate`,
+except that rules which cannot change the result are not matched at all
+(so errors they would raise, e.g. for a missing location, are not).
+
+Functions are cached in memory per canonical form of the rules (see
+`canonical.fingerprint`).
+"""
+import datetime as dt
+from typing import Callable, Dict, List
+
+from astral import LocationInfo
+
+from . import data_structures as ds
+from . import datetime_utils as dt_utils
+from .canonical import canonicalize, fingerprint
+from .common import StripedLock, compute_once
+
+Evaluator = Callable[[dt.datetime, LocationInfo], ds.RuleModifier]
+
+# fingerprint -> compiled evaluator
+COMPILED: Dict[str, Evaluator] = {}
+LOCKS = StripedLock()
+CLOSED = ds.RuleModifier(ds.RuleStatus.closed, None)
+MICROSECONDS = {"hours": 3_600_000_000, "minutes": 60_000_000}
+DAY = 24 * MICROSECONDS["hours"]
+
+
+class Source:
+    """The source of an evaluator, with objects it refers to as constants"""
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.constants: List = []
+
+    def constant(self, value) -> str:
+        self.constants.append(value)
+        return f"K[{len(self.constants) - 1}]"
+
+    def line(self, text: str, indent: int = 1) -> None:
+        self.lines.append("    " * indent + text)
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def fixed_microseconds(t: ds.ExtendedTime):
+    """The time as microseconds after midnight, or None unless it is fixed"""
+    if t is None or t.time is None:
+        return None
+    return t.time.hour * MICROSECONDS["hours"] + t.time.minute * MICROSECONDS["minutes"]
+
+
+def time_condition(span: ds.TimeSpan, source: Source) -> str:
+    """Mirrors `TimeSpan.contains`"""
+    start = fixed_microseconds(span.start)
+    end = fixed_microseconds(span.end)
+    if start is None or (end is None and span.end is not None and not span.open_end):
+        return f"{source.constant(span)}.contains(datetime, loc)"
+    if span.open_end:
+        return f"us >= {start}"
+    if span.end is None:
+        return f"us == {start}"
+    if start <= end:
+        return f"{start} <= us <= {end}"
+    return f"us >= {start}"
+
+
+def spill_condition(span: ds.TimeSpan, source: Source) -> str:
+    """Mirrors `TimeSpan.carries_over`, or None if the span never spills"""
+    if not span.spills():
+        return None
+    start = fixed_microseconds(span.start)
+    end = fixed_microseconds(span.end)
+    if start is None or end is None:
+        return f"{source.constant(span)}.carries_over(datetime, loc)"
+    if end < start:
+        end += DAY
+    return f"us <= {end - DAY}"
+
+
+def weekday_condition(
+    selector: ds.WeekdaySelector, source: Source, ctx: str = "ctx"
+) -> str:
+    """Mirrors `WeekdaySelector.contains`"""
+    days = set()
+    conditions = []
+    for span in selector.weekdays or []:
+        if span.end is not None:
+            days.update(day.value for day in span.start.until(span.end))
+        elif span.every:
+            conditions.append(f"{source.constant(span)}.contains({ctx})")
+        else:
+            days.add(span.start.value)
+    if days:
+        conditions.insert(0, f"{ctx}.weekday in {set(sorted(days))}")
+    for holiday in selector.holidays or []:
+        conditions.append(f"{ctx}.is_holiday({holiday.day_offset})")
+    return "(" + " or ".join(conditions or ["False"]) + ")"
+
+
+def span_condition(
+    field: str, start: int, end: int, every: int, open_end: bool, ctx: str = "ctx"
+) -> str:
+    """Mirrors `YearSpan.contains` and `WeekSpan.contains`"""
+    conditions = [f"{ctx}.{field} >= {start}"]
+    if not open_end:
+        conditions.append(f"{ctx}.{field} <= {end}")
+    if every is not None:
+        conditions.append(f"({ctx}.{field} - {start}) % {every} == 0")
+    return "(" + " and ".join(conditions) + ")"
+
+
+def date_conditions(
+    selector: ds.TimeSelector, source: Source, ctx: str = "ctx"
+) -> List[str]:
+    """Mirrors `TimeSelector.contains_date`"""
+    conditions = []
+    if selector.years is not None:
+        years = [
+            span_condition("year", y.start, y.end, y.every, y.open_end, ctx)
+            for y in selector.years
+        ]
+        conditions.append("(" + " or ".join(years) + ")")
+    if selector.monthdays is not None:
+        conditions.append(f"{source.constant(selector.monthdays)}.contains({ctx})")
+    if selector.weeks is not None:
+        weeks = [
+            span_condition("week", w.start, w.end, w.every, w.end is None, ctx)
+            for w in selector.weeks
+        ]
+        conditions.append("(" + " or ".join(weeks) + ")")
+    if selector.weekdays is not None:
+        conditions.append(weekday_condition(selector.weekdays, source, ctx))
+    return conditions
+
+
+def selector_condition(selector: ds.TimeSelector, source: Source) -> str:
+    """Mirrors `TimeSelector.contains`"""
+    if selector.always:
+        return "True"
+    conditions = date_conditions(selector, source)
+    if selector.times is not None:
+        times = [time_condition(span, source) for span in selector.times]
+        conditions.append("(" + " or ".join(times) + ")")
+    condition = " and ".join(conditions) or "True"
+    if not selector.spills():
+        return condition
+    # times carried over from the day before
+    spills = [spill_condition(span, source) for span in selector.times]
+    carried = date_conditions(selector, source, "prev")
+    carried.append("(" + " or ".join(s for s in spills if s is not None) + ")")
+    return f"({condition}) or ({' and '.join(carried)})"
+
+
+def generate(rules: List[ds.Rule]) -> Source:
+    """The source of a function evaluating rules, see `evaluate.evaluate`"""
+    source = Source()
+    source.line("def evaluate(datetime, loc):", 0)
+    source.line("ctx = date_context(datetime.date())")
+    if any(rule.time_selector.spills() for rule in rules):
+        source.line("prev = date_context(ctx.date - ONE_DAY)")
+    source.line(
+        f"us = datetime.hour * {MICROSECONDS['hours']}"
+        f" + datetime.minute * {MICROSECONDS['minutes']}"
+        " + datetime.second * 1000000 + datetime.microsecond"
+    )
+    source.line("found_open = found_unknown = None")
+    for rule in rules:
+        condition = selector_condition(rule.time_selector, source)
+        modifier = source.constant(rule.modifier)
+        if rule.modifier.status is ds.RuleStatus.closed:
+            source.line(f"if {condition}:")
+            source.line(f"return {modifier}", 2)
+        elif rule.modifier.status is ds.RuleStatus.open:
+            source.line(f"if found_open is None and {condition}:")
+            source.line(f"found_open = {modifier}", 2)
+        else:
+            source.line(
+                f"if found_open is None and found_unknown is None and {condition}:"
+            )
+            source.line(f"found_unknown = {modifier}", 2)
+    source.line("return found_open or found_unknown or CLOSED")
+    return source
+
+
+def compile_rules(rules: List[ds.Rule]) -> Evaluator:
+    """A function evaluating the rules at a datetime and location"""
+    rules = canonicalize(rules)
+    key = fingerprint(rules)
+
+    def build() -> Evaluator:
+        source = generate(rules)
+        namespace = {
+            "K": source.constants,
+            "CLOSED": CLOSED,
+            "date_context": dt_utils.date_context,
+            "ONE_DAY": ds.ONE_DAY,
+        }
+        code = compile(source.text(), f"<opening hours {key[:12]}>", "exec")
+        exec(code, namespace)
+        return namespace["evaluate"]
+
+    return compute_once(COMPILED, LOCKS, key, build)
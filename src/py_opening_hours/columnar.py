@@ -0,0 +1,149 @@
+"""Evaluate columns of opening hours against columns of timestamps
+
+Requires numpy, along with pandas or pyarrow for the column types (all
+installed by the `columnar` extra). Timestamps are taken to be naive
+local times, as in `evaluate.evaluate`. Rows are grouped by distinct
+opening hours string and every group is evaluated by looking up its
+timestamps in the status segments of the distinct dates it covers (see
+`evaluate.day_segments`), so that no python objects are created per row.
+"""
+import datetime as dt
+from typing import List, Sequence
+
+from astral import LocationInfo
+
+from . import solar
+from .analysis import Dependency
+from .common import import_optional
+from .data_structures import RuleStatus, EPSILON
+from .evaluate import OpenHours
+
+np = import_optional("numpy", "columnar")
+
+# status codes are the `RuleStatus` values
+STATUSES = [
+    status.name for status in (RuleStatus.unknown, RuleStatus.open, RuleStatus.closed)
+]
+MISSING = -1
+
+EPOCH = dt.date(1970, 1, 1)
+DAY = np.int64(24 * 60 * 60 * 1_000_000)
+
+
+def evaluate_array(
+    hours: OpenHours, timestamps: np.ndarray, loc: LocationInfo = None
+) -> np.ndarray:
+    """Evaluate an array of timestamps against one opening hours spec.
+
+    Returns an int8 array of status codes, `MISSING` for NaT timestamps.
+    """
+    timestamps = np.asarray(timestamps, dtype="datetime64[us]")
+    result = np.full(timestamps.shape, MISSING, dtype=np.int8)
+    present = ~np.isnat(timestamps)
+    micros = timestamps[present].astype(np.int64)
+    if not micros.size:
+        return result
+    days = np.unique(micros // DAY).tolist()
+    if loc is not None and Dependency.location in hours.analyze().dependencies:
+        solar.precompute(
+            [loc],
+            EPOCH + dt.timedelta(days=days[0]),
+            EPOCH + dt.timedelta(days=days[-1]),
+        )
+    bounds: List[int] = []
+    codes: List[int] = []
+    for day in days:
+        date = EPOCH + dt.timedelta(days=day)
+        for segment in hours.day_segments(date, loc):
+            bounds.append(day * int(DAY) + segment.start // EPSILON)
+            codes.append(segment.modifier.status.value)
+    index = np.searchsorted(np.array(bounds, dtype=np.int64), micros, side="right")
+    result[present] = np.array(codes, dtype=np.int8)[index - 1]
+    return result
+
+
+def evaluate_codes(
+    codes: np.ndarray,
+    specs: Sequence[str],
+    timestamps: np.ndarray,
+    loc: LocationInfo = None,
+) -> np.ndarray:
+    """Evaluate dictionary encoded opening hours against timestamps.
+
+    `codes` indexes into `specs` (negative codes are missing values) and
+    each distinct spec is parsed and evaluated once for all of its rows.
+    """
+    codes = np.asarray(codes)
+    timestamps = np.asarray(timestamps, dtype="datetime64[us]")
+    result = np.full(codes.shape, MISSING, dtype=np.int8)
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, np.arange(len(specs)), side="left")
+    ends = np.searchsorted(sorted_codes, np.arange(len(specs)), side="right")
+    for spec, start, end in zip(specs, starts.tolist(), ends.tolist()):
+        if start == end:
+            continue
+        rows = order[start:end]
+        hours = OpenHours.from_string(spec)
+        result[rows] = evaluate_array(hours, timestamps[rows], loc)
+    return result
+
+
+def evaluate_column(hours, timestamps, loc: LocationInfo = None):
+    """Evaluate a column of opening hours strings against a timestamp column.
+
+    Accepts pyarrow arrays (or chunked arrays) or pandas series and returns
+    a dictionary encoded status column of the same flavor, i.e. a
+    `pyarrow.DictionaryArray` or a categorical `pandas.Series`, whose
+    categories are `STATUSES`. Missing strings or timestamps give nulls.
+    Time zone aware timestamps are evaluated at their local wall clock time.
+    """
+    if _is_arrow(hours):
+        return _evaluate_arrow(hours, timestamps, loc)
+    return _evaluate_pandas(hours, timestamps, loc)
+
+
+def _is_arrow(column) -> bool:
+    return type(column).__module__.startswith("pyarrow")
+
+
+def _evaluate_arrow(hours, timestamps, loc):
+    pa = import_optional("pyarrow", "columnar")
+    pc = import_optional("pyarrow.compute", "columnar")
+
+    if isinstance(hours, pa.ChunkedArray):
+        hours = hours.combine_chunks()
+    if isinstance(timestamps, pa.ChunkedArray):
+        timestamps = timestamps.combine_chunks()
+    encoded = pc.dictionary_encode(hours)
+    codes = pc.fill_null(encoded.indices, MISSING).to_numpy()
+    if getattr(timestamps.type, "tz", None) is not None:
+        # the wall clock time in the column's time zone
+        if not hasattr(pc, "local_timestamp"):
+            raise ValueError(
+                "Time zone aware timestamps need pyarrow 12 or later, "
+                "convert them to naive local times first."
+            )
+        timestamps = pc.local_timestamp(timestamps)
+    micros = timestamps.cast(pa.timestamp("us")).to_numpy(zero_copy_only=False)
+    result = evaluate_codes(codes, encoded.dictionary.to_pylist(), micros, loc)
+    return pa.DictionaryArray.from_arrays(
+        pa.array(result, mask=result == MISSING, type=pa.int8()),
+        pa.array(STATUSES),
+    )
+
+
+def _evaluate_pandas(hours, timestamps, loc):
+    pd = import_optional("pandas", "columnar")
+
+    hours = pd.Series(hours)
+    codes, specs = pd.factorize(hours)
+    timestamps = pd.Series(timestamps)
+    if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        # the wall clock time in the column's time zone
+        timestamps = timestamps.dt.tz_localize(None)
+    micros = timestamps.to_numpy(dtype="datetime64[us]")
+    result = evaluate_codes(codes, list(specs), micros, loc)
+    return pd.Series(
+        pd.Categorical.from_codes(result, categories=STATUSES), index=hours.index
+    )
@@ -1,2 +1,55 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
 class OpeningHoursError(Exception):
     pass
+
+
+class StripedLock:
+    """A fixed number of reentrant locks shared by keys according to their hash
+
+    Guards caches without serializing unrelated keys behind a single lock.
+    """
+
+    def __init__(self, stripes: int = 64) -> None:
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def __call__(self, key: Hashable) -> threading.RLock:
+        return self._locks[hash(key) % len(self._locks)]
+
+
+def compute_once(
+    cache: Dict, locks: StripedLock, key: Hashable, compute: Callable[[], T]
+) -> T:
+    """Look a key up in a cache, computing its value at most once
+
+    Reads are lock free. Values computed under the key's lock should be
+    immutable (or no longer mutated) once they are in the cache.
+    """
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    with locks(key):
+        try:
+            return cache[key]
+        except KeyError:
+            value = compute()
+            cache[key] = value
+            return value
+
+
+def import_optional(name: str, extra: str) -> ModuleType:
+    """Import an optional dependency, naming the extra installing it if missing"""
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise ImportError(
+            f"{name} is required, install it with: "
+            f"pip install 'py-opening-hours[{extra}]'"
+        ) from e
@@ -1,14 +1,20 @@
-from typing import Iterable, NamedTuple, List, Tuple
+from functools import lru_cache
+from typing import Iterable, NamedTuple, List, Tuple, Union
 from enum import Enum
 import datetime as dt
 from astral import LocationInfo
-from astral.sun import sun
 from . import datetime_utils as dt_utils
-from . import settings
 from .common import OpeningHoursError
 
 
 TODAY = dt.date.today()
+MIDNIGHT = dt.timedelta(0)
+ONE_DAY = dt.timedelta(days=1)
+# datetimes have microsecond resolution so the closed interval [a, b]
+# is equivalent to the half open interval [a, b + EPSILON)
+EPSILON = dt.timedelta(microseconds=1)
+# date selectors match either dates or their shared `dt_utils.DateContext`
+DateLike = Union[dt.date, dt_utils.DateContext]
 
 
 class Comment(NamedTuple):
@@ -48,12 +54,23 @@ class Event(Enum):
             raise OpeningHoursError(
                 f"Relative time {self.name} encountered, please specify location."
             )
-        return sun(loc.observer, date=date, tzinfo=loc.timezone)[self.name]
+        return dt_utils.get_sun_time(loc, date, self.name)
 
     def to_time(self, date: dt.date, loc: LocationInfo) -> dt.time:
         return self.to_datetime(date, loc).time()
 
 
+# the offsets from midnight that sun events fall between, in local time
+EVENT_BOUNDS = {
+    Event.dawn: (MIDNIGHT, ONE_DAY / 2),
+    Event.sunrise: (MIDNIGHT, ONE_DAY / 2),
+    Event.sunset: (ONE_DAY / 2, ONE_DAY),
+    Event.dusk: (ONE_DAY / 2, ONE_DAY),
+}
+# time spans whose spill over was worked out, see `span_spills`
+SPILLS_CACHED = 4096
+
+
 class Time(NamedTuple):
     hour: int
     minute: int
@@ -65,7 +82,12 @@ class Time(NamedTuple):
         return Time(h, m)
 
     def to_time(self) -> dt.time:
-        return dt.time(self.hour, self.minute, 0)
+        # extended times (e.g. 26:00) are a time of the following day
+        return dt.time(self.hour % 24, self.minute, 0)
+
+    def to_timedelta(self) -> dt.timedelta:
+        # positional arguments are much cheaper than keywords
+        return dt.timedelta(0, self.hour * 3600 + self.minute * 60)
 
 
 class VariableTime(NamedTuple):
@@ -82,6 +104,9 @@ class VariableTime(NamedTuple):
             (event,) = tokens
             return VariableTime(event)
 
+    def offset(self) -> dt.timedelta:
+        return self.plus_or_minus.modify(self.time.to_timedelta())
+
     def to_time(self, date: dt.date, loc: LocationInfo) -> dt.time:
         t = self.event.to_datetime(date, loc)
         offset = dt.timedelta(hours=self.time.hour, minutes=self.time.minute)
@@ -119,6 +144,24 @@ class ExtendedTime(NamedTuple):
             return self.vtime.to_time(date, loc)
         raise OpeningHoursError("One of `time`, `vtime` should be not None.")
 
+    def to_timedelta(self, date: dt.date, loc: LocationInfo) -> dt.timedelta:
+        """The time as an offset from midnight"""
+        if self.time is not None:
+            return self.time.to_timedelta()
+        return dt_utils.time_to_timedelta(self.to_time(date, loc))
+
+    def bounds(self) -> Tuple[dt.timedelta, dt.timedelta]:
+        """The earliest and latest offsets from midnight of the time on any date"""
+        if self.time is not None:
+            t = self.time.to_timedelta()
+            return (t, t)
+        lo, hi = EVENT_BOUNDS[self.vtime.event]
+        offset = self.vtime.offset()
+        if lo + offset < MIDNIGHT or hi + offset > ONE_DAY:
+            # wraps around midnight on some dates
+            return (MIDNIGHT, ONE_DAY)
+        return (lo + offset, hi + offset)
+
 
 class TimeSpan(NamedTuple):
     start: ExtendedTime
@@ -138,21 +181,101 @@ class TimeSpan(NamedTuple):
     def to_time_interval(self, date, loc):
         return self.start.to_time(date, loc), self.end.to_time(date, loc)
 
-    def contains(self, datetime: dt.datetime, loc: LocationInfo) -> bool:
-        date = datetime.date()
-        time = datetime.time()
-        start = self.start.to_time(date, loc)
-        after_open = time >= start
+    def to_interval(
+        self, date: dt.date, loc: LocationInfo, closed: bool = True
+    ) -> Tuple[dt.timedelta, dt.timedelta]:
+        """The half open interval covered by the span starting on date
+
+        The interval is given as offsets from the date's midnight and ends
+        after the next midnight for spans carrying over into the next day,
+        i.e. ending past 24:00 (e.g. 18:00-26:00) or before they start
+        (e.g. 22:00-02:00, which is the same as 22:00-26:00). Spans include
+        their end, unless not `closed` (e.g. to measure their duration).
+        """
+        margin = EPSILON if closed else MIDNIGHT
+        start = self.start.to_timedelta(date, loc)
         if self.open_end:
-            return after_open
-        end = self.end.to_time(date, loc)
-        before_end = time <= end
-        if start <= end:
-            return after_open and before_end
-        # if end < start (e.g. 9pm-5am) we want either
-        # time >= start (e.g. 10pm) OR
-        # time <= end (e.g. 4am)
-        return after_open or before_end
+            return (start, ONE_DAY)
+        if self.end is None:
+            return (start, start + margin)
+        end = self.end.to_timedelta(date, loc)
+        if end < start:
+            end = ONE_DAY + self.end.to_timedelta(date + ONE_DAY, loc)
+        return (start, end + margin)
+
+    def spills(self) -> bool:
+        """Whether the span may carry over into the next day"""
+        return span_spills(self)
+
+    def to_intervals(
+        self, date: dt.date, loc: LocationInfo, closed: bool = True
+    ) -> List[Tuple[dt.timedelta, dt.timedelta]]:
+        """The half open intervals of the day covered by this time span
+
+        Intervals are given as offsets from midnight and agree with
+        `contains`, e.g. 21:00-05:00 is [21:00, 24:00) (see `to_spill`).
+        """
+        start, end = self.to_interval(date, loc, closed)
+        return [(start, min(end, ONE_DAY))]
+
+    def to_spill(
+        self, date: dt.date, loc: LocationInfo, closed: bool = True
+    ) -> List[Tuple[dt.timedelta, dt.timedelta]]:
+        """The half open intervals of the next day covered by the span starting on date
+
+        Intervals are given as offsets from the next day's midnight, e.g.
+        21:00-05:00 is [00:00, 05:00]. Spans ending at 24:00 do not spill.
+        """
+        if not self.spills():
+            return []
+        _, end = self.to_interval(date, loc, closed)
+        if end <= ONE_DAY + (EPSILON if closed else MIDNIGHT):
+            return []
+        return [(MIDNIGHT, min(end - ONE_DAY, ONE_DAY))]
+
+    def contains(self, datetime: dt.datetime, loc: LocationInfo) -> bool:
+        """Whether datetime is covered by the span starting on its date"""
+        start, end = self.to_interval(datetime.date(), loc)
+        return start <= dt_utils.time_to_timedelta(datetime.time()) < end
+
+    def carries_over(self, datetime: dt.datetime, loc: LocationInfo) -> bool:
+        """Whether datetime is covered by the span starting on the day before"""
+        offset = dt_utils.time_to_timedelta(datetime.time())
+        previous = datetime.date() - ONE_DAY
+        return any(lo <= offset < hi for lo, hi in self.to_spill(previous, loc))
+
+
+@lru_cache(maxsize=SPILLS_CACHED)
+def span_spills(span: TimeSpan) -> bool:
+    """Whether a span may carry over into the next day
+
+    Fixed spans spill when they end past 24:00 or before they start. Spans
+    with sun events spill when their end can fall before their start, e.g.
+    sunset-sunrise but not sunrise-sunset, assuming dawn and sunrise happen
+    before noon and sunset and dusk after noon.
+    """
+    if span.open_end or span.end is None:
+        return False
+    start, end = span.start, span.end
+    if start.time is not None and end.time is not None:
+        end_time = end.time
+        if end_time < start.time:
+            end_time = Time(end_time.hour + 24, end_time.minute)
+        return end_time > Time(24, 0)
+    if end.time is not None and end.time > Time(24, 0):
+        return True
+    start_bounds, end_bounds = start.bounds(), end.bounds()
+    if end_bounds[0] >= start_bounds[1]:
+        return False
+    if start.vtime is not None and end.vtime is not None:
+        # e.g. (dawn+00:30)-(sunrise+00:30) ends after it starts, unless it wraps
+        return (
+            start_bounds == (MIDNIGHT, ONE_DAY)
+            or end_bounds == (MIDNIGHT, ONE_DAY)
+            or end.vtime.event.value < start.vtime.event.value
+            or end.vtime.offset() < start.vtime.offset()
+        )
+    return True
 
 
 class DayOfWeek(Enum):
@@ -198,30 +321,31 @@ class WeekdaySpan(NamedTuple):
         offset = data.get("offset", 0)
         return WeekdaySpan(start, end, every, offset)
 
-    def _contains_range(self, date: dt.date) -> bool:
-        wday = DayOfWeek.from_date(date)
-        for day in self.start.until(self.end):
-            if day is wday:
-                return True
-        return False
+    def _contains_range(self, ctx: dt_utils.DateContext) -> bool:
+        # ranges wrap around the end of the week, e.g. Sa-Mo
+        days_after_start = (ctx.weekday - self.start.value) % 7
+        return days_after_start <= (self.end.value - self.start.value) % 7
 
-    def _contains_every(self, date: dt.date):
-        offset = dt.timedelta(days=self.offset)
-        offset_date = date - offset
-        if DayOfWeek.from_date(offset_date) is not self.start:
+    def _contains_every(self, ctx: dt_utils.DateContext):
+        if self.offset:
+            ctx = dt_utils.date_context(ctx.date - dt.timedelta(days=self.offset))
+        if ctx.weekday != self.start.value:
             return False
-        days = list(dt_utils.weekdays_in_month(offset_date))
         for n in self.every:
-            if offset_date == (days[n - 1 if n > 0 else n]):
+            # a single nth weekday or an (inclusive) range of them
+            first, last = n if isinstance(n, tuple) else (n, n)
+            nth = ctx.nth_weekday if first > 0 else ctx.nth_last_weekday
+            if first <= nth <= last:
                 return True
         return False
 
-    def contains(self, date: dt.date) -> bool:
+    def contains(self, date: DateLike) -> bool:
+        ctx = dt_utils.as_context(date)
         if self.end is not None:
-            return self._contains_range(date)
+            return self._contains_range(ctx)
         if self.every:
-            return self._contains_every(date)
-        return self.start is DayOfWeek.from_date(date)
+            return self._contains_every(ctx)
+        return self.start.value == ctx.weekday
 
 
 class Month(Enum):
@@ -246,8 +370,8 @@ class Month(Enum):
 class SpecialDate(Enum):
     easter = 1
 
-    def contains(self, date: dt.date) -> bool:
-        return dt_utils.is_easter(date)
+    def contains(self, date: DateLike) -> bool:
+        return dt_utils.as_context(date).easter_offset == 0
 
 
 class Date(NamedTuple):
@@ -265,9 +389,10 @@ class Date(NamedTuple):
         special = data.get("special")
         return Date(year, month, day, special)
 
-    def contains(self, date: dt.date) -> bool:
+    def contains(self, date: DateLike) -> bool:
         if self.special is not None:
             return self.special.contains(date)
+        date = dt_utils.as_context(date).date
         return date == dt.date(self.year, self.month.value, self.day)
 
 
@@ -293,9 +418,8 @@ class Holiday(NamedTuple):
             ndays = 0
         return Holiday(htype, ndays)
 
-    def contains(self, date: dt.date) -> bool:
-        offset_date = date - dt.timedelta(days=self.day_offset)
-        return offset_date in dt_utils.get_holidays(settings.COUNTRY, settings.STATE)
+    def contains(self, date: DateLike) -> bool:
+        return dt_utils.as_context(date).is_holiday(self.day_offset)
 
 
 class DateOffset(NamedTuple):
@@ -321,9 +445,10 @@ class WeekdaySelector(NamedTuple):
         data = tokens.as_dict()
         return WeekdaySelector(data.get("weekday_ranges"), data.get("holidays"))
 
-    def contains(self, date: dt.date) -> bool:
-        return any(ws.contains(date) for ws in self.weekdays or []) or any(
-            hs.contains(date) for hs in self.holidays or []
+    def contains(self, date: DateLike) -> bool:
+        ctx = dt_utils.as_context(date)
+        return any(ws.contains(ctx) for ws in self.weekdays or []) or any(
+            hs.contains(ctx) for hs in self.holidays or []
         )
 
 
@@ -336,8 +461,8 @@ class WeekSpan(NamedTuple):
     def load(tokens):
         return WeekSpan(*tokens)
 
-    def contains(self, date: dt.date) -> bool:
-        _, weeknum, _ = date.isocalendar()
+    def contains(self, date: DateLike) -> bool:
+        weeknum = dt_utils.as_context(date).week
         return (
             (weeknum >= self.start)
             and (self.end is None or weeknum <= self.end)
@@ -372,7 +497,7 @@ class MonthdaySpan(NamedTuple):
             end = start
         return MonthdaySpan(start, None, end, None, False)
 
-    def contains(self, date: dt.date):
+    def contains(self, date: DateLike):
         raise NotImplementedError
 
 
@@ -403,18 +528,19 @@ class YearSpan(NamedTuple):
             end = data.get("end_year", start)
         return YearSpan(start, end, open_end, every)
 
-    def contains(self, date: dt.date) -> bool:
+    def contains(self, date: DateLike) -> bool:
+        year = dt_utils.as_context(date).year
         return (
-            (date.year >= self.start)
-            and (self.open_end or (date.year <= self.end))
-            and (self.every is None or ((date.year - self.start) % self.every == 0))
+            (year >= self.start)
+            and (self.open_end or (year <= self.end))
+            and (self.every is None or ((year - self.start) % self.every == 0))
         )
 
 
 class TimeSelector(NamedTuple):
     always: bool
     comment: Comment
-    years: YearSpan
+    years: List[YearSpan]
     monthdays: MonthdaySpan
     weeks: List[WeekSpan]
     weekdays: WeekdaySelector
@@ -432,19 +558,51 @@ class TimeSelector(NamedTuple):
         times = data.get("times")
         return TimeSelector(always, comment, years, monthdays, weeks, weekdays, times)
 
+    def contains_date(self, date: DateLike) -> bool:
+        """Whether the date selectors (everything but times) match the date"""
+        if self.always:
+            return True
+        ctx = dt_utils.as_context(date)
+        return (
+            (self.years is None or any(ys.contains(ctx) for ys in self.years))
+            and (self.monthdays is None or self.monthdays.contains(ctx))
+            and (self.weeks is None or any((ws.contains(ctx) for ws in self.weeks)))
+            and (self.weekdays is None or self.weekdays.contains(ctx))
+        )
+
+    def time_intervals(
+        self, date: dt.date, loc: LocationInfo, closed: bool = True
+    ) -> List[Tuple[dt.timedelta, dt.timedelta]]:
+        """The half open intervals of the day selected by the time selectors"""
+        if self.always or self.times is None:
+            return [(MIDNIGHT, ONE_DAY)]
+        return [iv for ts in self.times for iv in ts.to_intervals(date, loc, closed)]
+
+    def spills(self) -> bool:
+        """Whether the selected times may carry over into the next day"""
+        return not self.always and any(ts.spills() for ts in self.times or [])
+
+    def spill_intervals(
+        self, date: dt.date, loc: LocationInfo, closed: bool = True
+    ) -> List[Tuple[dt.timedelta, dt.timedelta]]:
+        """The half open intervals of the next day selected from date"""
+        if not self.spills():
+            return []
+        return [iv for ts in self.times for iv in ts.to_spill(date, loc, closed)]
+
     def contains(self, datetime: dt.datetime, loc: LocationInfo) -> bool:
         if self.always:
             return True
         date = datetime.date()
+        if self.contains_date(date) and (
+            self.times is None or any(ts.contains(datetime, loc) for ts in self.times)
+        ):
+            return True
+        # times carried over from the day before, e.g. "Fr 22:00-02:00" on Sa
         return (
-            (self.years is None or self.years.contains(date))
-            and (self.monthdays is None or self.monthdays.contains(date))
-            and (self.weeks is None or any((ws.contains(date) for ws in self.weeks)))
-            and (self.weekdays is None or self.weekdays.contains(date))
-            and (
-                self.times is None
-                or any(ts.contains(datetime, loc) for ts in self.times)
-            )
+            self.spills()
+            and self.contains_date(date - ONE_DAY)
+            and any(ts.carries_over(datetime, loc) for ts in self.times)
         )
 
 
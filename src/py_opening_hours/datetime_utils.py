@@ -1,8 +1,17 @@
 import datetime as dt
 import calendar
-from typing import Iterable
+import copy
+import math
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Deque, FrozenSet, Iterable, NamedTuple, Tuple, Union
 import holidays
+from astral import LocationInfo, Observer
+from astral import sun
 from dateutil.easter import easter
+from . import settings
+from .common import StripedLock, compute_once
 
 
 def first_weekday_in_month(date: dt.date) -> dt.date:
@@ -33,17 +42,169 @@ def weekdays_in_month(date: dt.date) -> Iterable[dt.date]:
         day += 7
 
 
+# (country, state) -> holiday calendar, which expands lazily to the years
+# looked up in it. Calendars are only used while holding their region's lock
 HOLIDAYS = {}
+# (country, state, year) -> the dates of the year's holidays
+HOLIDAY_DATES = {}
+REGION_LOCKS = StripedLock()
+
+
+def _region_calendar(country, state):
+    """The shared calendar of a region, only to use holding its region's lock"""
+    return compute_once(
+        HOLIDAYS,
+        REGION_LOCKS,
+        (country, state),
+        lambda: holidays.country_holidays(country, state=state),
+    )
 
 
 def get_holidays(country, state):
+    """A copy of the holiday calendar of a region, free to expand or modify"""
+    with REGION_LOCKS((country, state)):
+        return copy.deepcopy(_region_calendar(country, state))
+
+
+def get_holiday_dates(country, state, year: int) -> FrozenSet[dt.date]:
+    """The holidays of a year, as an immutable set cheap to look dates up in"""
+    key = (country, state, year)
     try:
-        return HOLIDAYS[(country, state)]
+        return HOLIDAY_DATES[key]
     except KeyError:
-        res = holidays.country_holidays(country, state=state)
-        HOLIDAYS[(country, state)] = res
-        return res
+        pass
+    with REGION_LOCKS((country, state)):
+        if key not in HOLIDAY_DATES:
+            region_holidays = _region_calendar(country, state)
+            # looking up any date of the year expands the calendar to the year
+            region_holidays.get(dt.date(year, 1, 1))
+            HOLIDAY_DATES[key] = frozenset(d for d in region_holidays if d.year == year)
+        return HOLIDAY_DATES[key]
+
+
+SUN_EVENTS = {
+    "dawn": sun.dawn,
+    "sunrise": sun.sunrise,
+    "sunset": sun.sunset,
+    "dusk": sun.dusk,
+}
+# (location key, date, event) -> datetime, for dates without a sun table
+SUN = {}
+# the keys of SUN, oldest first, evicted beyond SUN_CACHED
+SUN_KEYS: Deque[Tuple] = deque()
+SUN_CACHED = 65536
+SUN_EVICTING = threading.Lock()
+# (location key, year) -> table of the year's sun events, see `solar.SunTable`
+SUN_TABLES = {}
+SUN_LOCKS = StripedLock()
+
+
+def snap_to_grid(degrees: float, grid: float) -> float:
+    """The center of the grid cell containing degrees"""
+    return (math.floor(degrees / grid) + 0.5) * grid
+
+
+def sun_observer(loc: LocationInfo) -> Observer:
+    """The observer used to compute sun events at a location
+
+    This is the location itself, or the center of its grid cell if
+    `settings.SUN_GRID` is set.
+    """
+    observer = loc.observer
+    grid = settings.SUN_GRID
+    if grid is None:
+        return observer
+    return Observer(
+        min(snap_to_grid(observer.latitude, grid), 90.0),
+        min(snap_to_grid(observer.longitude, grid), 180.0),
+        observer.elevation,
+    )
+
+
+def sun_key(loc: LocationInfo) -> Tuple:
+    observer = sun_observer(loc)
+    return (observer.latitude, observer.longitude, observer.elevation, loc.timezone)
+
+
+def get_sun_time(loc: LocationInfo, date: dt.date, event: str) -> dt.datetime:
+    """The time of a sun event (e.g. sunrise) on a date at a location.
+
+    Times are looked up in the precomputed sun tables (see `solar.precompute`)
+    and otherwise calculated one at a time, keeping the latest `SUN_CACHED`.
+    """
+    key = sun_key(loc)
+    table = SUN_TABLES.get((key, date.year))
+    if table is not None:
+        return table.get(date, event)
+    computed = []
+
+    def compute():
+        computed.append(True)
+        return SUN_EVENTS[event](sun_observer(loc), date, tzinfo=loc.timezone)
+
+    time = compute_once(SUN, SUN_LOCKS, (key, date, event), compute)
+    if computed:
+        with SUN_EVICTING:
+            SUN_KEYS.append((key, date, event))
+            while len(SUN_KEYS) > SUN_CACHED:
+                SUN.pop(SUN_KEYS.popleft(), None)
+    return time
 
 
 def is_easter(date: dt.date) -> bool:
-    return date == easter(date.year)
+    return date == easter_date(date.year)
+
+
+@lru_cache(maxsize=None)
+def easter_date(year: int) -> dt.date:
+    return easter(year)
+
+
+class DateContext(NamedTuple):
+    """Facts about a date shared by the selectors matching against it"""
+
+    date: dt.date
+    year: int
+    weekday: int
+    # ISO week number
+    week: int
+    day_of_year: int
+    # the weekday is the nth of its month, counting from the start (1, 2, ...)
+    # and from the end (-1, -2, ...)
+    nth_weekday: int
+    nth_last_weekday: int
+    # days after easter sunday of the year, negative before it
+    easter_offset: int
+
+    def is_holiday(self, offset: int = 0) -> bool:
+        """Whether the date `offset` days earlier is a public holiday"""
+        date = self.date - dt.timedelta(days=offset) if offset else self.date
+        return date in get_holiday_dates(settings.COUNTRY, settings.STATE, date.year)
+
+
+@lru_cache(maxsize=4096)
+def date_context(date: dt.date) -> DateContext:
+    _, ndays = calendar.monthrange(date.year, date.month)
+    return DateContext(
+        date,
+        date.year,
+        date.weekday(),
+        date.isocalendar()[1],
+        date.timetuple().tm_yday,
+        (date.day - 1) // 7 + 1,
+        -((ndays - date.day) // 7 + 1),
+        (date - easter_date(date.year)).days,
+    )
+
+
+def as_context(date: Union[dt.date, DateContext]) -> DateContext:
+    if isinstance(date, DateContext):
+        return date
+    return date_context(date)
+
+
+def time_to_timedelta(time: dt.time) -> dt.timedelta:
+    """The time as an offset from midnight"""
+    return dt.timedelta(
+        0, (time.hour * 60 + time.minute) * 60 + time.second, time.microsecond
+    )
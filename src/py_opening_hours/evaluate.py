@@ -1,24 +1,162 @@
 """Evaluate opening hours"""
 import datetime as dt
-from typing import Iterable, NamedTuple
+from enum import Enum
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from astral import LocationInfo
-from .data_structures import Rule, RuleModifier, RuleStatus
-from .syntax import parse
+from . import datetime_utils as dt_utils
+from . import settings
+from .analysis import (
+    HOLIDAY_FEATURES,
+    Analysis,
+    FastPath,
+    Feature,
+    analyze,
+    selector_features,
+)
+from .canonical import canonicalize, fingerprint
+from .codegen import Evaluator, compile_rules
+from .data_structures import Rule, RuleModifier, RuleStatus, EPSILON, MIDNIGHT, ONE_DAY
+from .common import StripedLock
+from .parse_cache import parse
+from .syntax import is_valid
+from .timeline import Timeline
+
+
+# guard the first parse of lazily parsed opening hours
+PARSE_LOCKS = StripedLock()
 
 
 class OpenHours:
-    def __init__(self, rules: Iterable[Rule]) -> None:
-        self.rules = list(rules)
+    def __init__(self, rules: Iterable[Rule], source: str = None) -> None:
+        self._rules = list(rules)
+        # the string the rules were parsed from, if any
+        self.source = source
+        # whether the source is valid, see `is_valid`
+        self.valid: Optional[bool] = None
 
     @classmethod
     def from_string(cls, s: str) -> "OpenHours":
         rules = parse(s)
-        return cls(rules)
+        return cls(rules, s)
+
+    @classmethod
+    def lazy(cls, s: str, valid: bool = None) -> "OpenHours":
+        """Opening hours parsed from s when their rules are first needed
+
+        `valid` may be given if already known, e.g. from `syntax.prescan`.
+        """
+        hours = cls.__new__(cls)
+        hours._rules = None
+        hours.source = s
+        hours.valid = valid
+        return hours
+
+    @property
+    def rules(self) -> List[Rule]:
+        rules = self._rules
+        if rules is None:
+            with PARSE_LOCKS(id(self)):
+                if self._rules is None:
+                    self._rules = list(parse(self.source))
+                rules = self._rules
+        return rules
+
+    @rules.setter
+    def rules(self, rules: Iterable[Rule]) -> None:
+        # the source and its validity no longer describe the rules
+        with PARSE_LOCKS(id(self)):
+            self._rules = list(rules)
+            self.source = None
+            self.valid = None
+
+    @property
+    def parsed(self) -> bool:
+        return self._rules is not None
+
+    def is_valid(self) -> Optional[bool]:
+        """Whether the source parses completely, None without a source"""
+        if self.valid is None and self.source is not None:
+            self.valid = is_valid(self.source)
+        return self.valid
 
     def evaluate(self, datetime: dt.datetime, loc: LocationInfo = None) -> RuleModifier:
         return evaluate(self.rules, datetime, loc)
 
+    def analyze(self) -> Analysis:
+        return analyze(self.rules)
+
+    def canonical(self) -> "OpenHours":
+        return OpenHours(canonicalize(self.rules))
+
+    def fingerprint(self) -> str:
+        return fingerprint(self.rules)
+
+    def compile(self) -> Evaluator:
+        """A specialized function equivalent to `evaluate`, see `codegen`"""
+        return compile_rules(self.rules)
+
+    def day_segments(
+        self, date: dt.date, loc: LocationInfo = None, closed: bool = True
+    ) -> List["Segment"]:
+        return day_segments(self.rules, date, loc, closed)
+
+    def intervals(
+        self, start: dt.datetime, end: dt.datetime, loc: LocationInfo = None
+    ) -> Iterator["Interval"]:
+        return intervals(self.rules, start, end, loc)
+
+    def next_change(
+        self,
+        datetime: dt.datetime,
+        loc: LocationInfo = None,
+        horizon: dt.timedelta = None,
+    ) -> Optional["Interval"]:
+        return next_change(self.rules, datetime, loc, horizon or HORIZON)
+
+    def is_open_throughout(
+        self, start: dt.datetime, end: dt.datetime, loc: LocationInfo = None
+    ) -> bool:
+        return is_open_throughout(self.rules, start, end, loc)
+
+    def is_open_during(
+        self, start: dt.datetime, end: dt.datetime, loc: LocationInfo = None
+    ) -> bool:
+        return is_open_during(self.rules, start, end, loc)
+
+    def materialize(
+        self,
+        year: int,
+        loc: LocationInfo = None,
+        resolution: dt.timedelta = dt.timedelta(minutes=1),
+    ) -> Timeline:
+        """The run length encoded statuses of a year, see `timeline`"""
+        return materialize(segments_of(self.rules, loc), year, resolution)
+
+    def open_duration(
+        self, start: dt.datetime, end: dt.datetime, loc: LocationInfo = None
+    ) -> dt.timedelta:
+        return Durations(self.rules, loc).between(start, end)
+
+    def open_durations(
+        self,
+        start: dt.datetime,
+        end: dt.datetime,
+        bucket: "Bucket",
+        loc: LocationInfo = None,
+    ) -> List[Tuple[dt.datetime, dt.timedelta]]:
+        return Durations(self.rules, loc).buckets(start, end, bucket)
+
 
 class RuleMatch(NamedTuple):
     match: bool
@@ -45,16 +183,473 @@ def evaluate(
     Closed rules override open rules so if there are any closed rules
     matched the first match is immediately returned
     """
+    return resolve(
+        modifier
+        for is_match, modifier in (match(rule, datetime, loc) for rule in rules)
+        if is_match
+    )
+
+
+def resolve(modifiers: Iterable[RuleModifier]) -> RuleModifier:
+    """Pick the modifier that applies given those of the matched rules.
+
+    See `evaluate` for the precedence between statuses.
+    """
     matches = {}
-    for rule in rules:
-        is_match, modifier = match(rule, datetime, loc)
-        if is_match:
-            if modifier.status is RuleStatus.closed:
-                # if we match a closed rule return immediately
-                return modifier
-            matches.setdefault(modifier.status, modifier)
+    for modifier in modifiers:
+        if modifier.status is RuleStatus.closed:
+            # if we match a closed rule return immediately
+            return modifier
+        matches.setdefault(modifier.status, modifier)
     return (
         matches.get(RuleStatus.open)
         or matches.get(RuleStatus.unknown)
         or RuleModifier(RuleStatus.closed, None)
     )
+
+
+class Segment(NamedTuple):
+    """A half open interval of a day, given as offsets from midnight"""
+
+    start: dt.timedelta
+    end: dt.timedelta
+    modifier: RuleModifier
+
+
+def day_segments(
+    rules: Iterable[Rule], date: dt.date, loc: LocationInfo, closed: bool = True
+) -> List[Segment]:
+    """Partition a day into segments over which the evaluation is constant.
+
+    Evaluating any datetime on `date` gives the modifier of the segment
+    containing its time of day. Adjacent segments have distinct modifiers.
+    Times carried over from the day before (e.g. "Fr 22:00-02:00" on a
+    saturday) are included, so each date's spill over is computed once.
+    Unless `closed`, time spans exclude their end, e.g. 09:00-17:00 lasts
+    eight hours rather than one microsecond more.
+    """
+    ctx = dt_utils.date_context(date)
+    previous = date - ONE_DAY
+    matched = []
+    for rule in rules:
+        selector = rule.time_selector
+        intervals = []
+        if selector.contains_date(ctx):
+            intervals = selector.time_intervals(date, loc, closed)
+        # times carried over from the previous date, only looked up for
+        # the rules which may spill over
+        if selector.spills() and selector.contains_date(previous):
+            intervals = intervals + selector.spill_intervals(previous, loc, closed)
+        if intervals:
+            matched.append((intervals, rule.modifier))
+    bounds = {MIDNIGHT, ONE_DAY}
+    for intervals, _ in matched:
+        for interval in intervals:
+            bounds.update(interval)
+    bounds = sorted(bounds)
+    segments = []
+    for start, end in zip(bounds, bounds[1:]):
+        modifier = resolve(
+            modifier
+            for intervals, modifier in matched
+            if any(lo <= start < hi for lo, hi in intervals)
+        )
+        if segments and segments[-1].modifier == modifier:
+            segments[-1] = segments[-1]._replace(end=end)
+        else:
+            segments.append(Segment(start, end, modifier))
+    return segments
+
+
+# how far ahead to look for the next change in status
+HORIZON = dt.timedelta(days=366)
+# the next change of a schedule repeating every week starts within a week
+# and lasts less than a week, see `next_change`
+WEEKLY_HORIZON = dt.timedelta(days=14)
+
+
+class Interval(NamedTuple):
+    """A half open interval of datetimes"""
+
+    start: dt.datetime
+    end: dt.datetime
+    modifier: RuleModifier
+
+
+def intervals(
+    rules: Iterable[Rule], start: dt.datetime, end: dt.datetime, loc: LocationInfo
+) -> Iterator[Interval]:
+    """Partition [start, end) into maximal intervals of constant evaluation.
+
+    Evaluating any datetime in an interval gives its modifier and
+    consecutive intervals have distinct modifiers.
+    """
+    return walk(segments_of(rules, loc), start, end)
+
+
+def segments_of(
+    rules: Iterable[Rule], loc: LocationInfo, closed: bool = True
+) -> Callable[[dt.date], List[Segment]]:
+    """The day segments of rules as a function of the date, see `walk`"""
+    rules = list(rules)
+    return lambda date: day_segments(rules, date, loc, closed)
+
+
+def walk(
+    segments: Callable[[dt.date], List[Segment]], start: dt.datetime, end: dt.datetime
+) -> Iterator[Interval]:
+    """Join the segments of the days from start to end into maximal intervals"""
+    current = None
+    midnight = dt.datetime.combine(start.date(), dt.time())
+    while midnight < end:
+        for segment in segments(midnight.date()):
+            lo = max(start, midnight + segment.start)
+            hi = min(end, midnight + segment.end)
+            if lo >= hi:
+                continue
+            if current is not None and current.modifier == segment.modifier:
+                current = current._replace(end=hi)
+                continue
+            if current is not None:
+                yield current
+            current = Interval(lo, hi, segment.modifier)
+        midnight += ONE_DAY
+    if current is not None:
+        yield current
+
+
+def next_change(
+    rules: Iterable[Rule],
+    datetime: dt.datetime,
+    loc: LocationInfo,
+    horizon: dt.timedelta = HORIZON,
+) -> Optional[Interval]:
+    """The first interval after datetime whose evaluation differs from datetime's.
+
+    Returns None if the evaluation does not change within the horizon.
+    Constant rules never change, and rules repeating every week (see
+    `analysis.FastPath`) only need to be looked at for two weeks.
+    """
+    rules = list(rules)
+    fast_path = analyze(rules).fast_path
+    if fast_path is FastPath.constant:
+        return None
+    if fast_path is FastPath.weekly:
+        horizon = min(horizon, WEEKLY_HORIZON)
+    return first_change(segments_of(rules, loc), datetime, horizon)
+
+
+def first_change(
+    segments: Callable[[dt.date], List[Segment]],
+    datetime: dt.datetime,
+    horizon: dt.timedelta = HORIZON,
+) -> Optional[Interval]:
+    """`next_change` of the day segments given by a function of the date"""
+    following = walk(segments, datetime, datetime + horizon)
+    next(following, None)
+    return next(following, None)
+
+
+class Change(NamedTuple):
+    """A half open interval of datetimes over which two schedules differ"""
+
+    start: dt.datetime
+    end: dt.datetime
+    old: RuleModifier
+    new: RuleModifier
+
+
+def diff(
+    old: OpenHours,
+    new: OpenHours,
+    start: dt.datetime,
+    end: dt.datetime,
+    loc: LocationInfo = None,
+) -> Iterator[Change]:
+    """The maximal intervals from start to end where two schedules evaluate differently
+
+    This merges the intervals of constant evaluation of both schedules.
+    """
+    if old.fingerprint() == new.fingerprint():
+        return
+    olds = old.intervals(start, end, loc)
+    news = new.intervals(start, end, loc)
+    a = next(olds, None)
+    b = next(news, None)
+    current = None
+    while a is not None and b is not None:
+        lo = max(a.start, b.start)
+        hi = min(a.end, b.end)
+        if a.modifier != b.modifier:
+            if (
+                current is not None
+                and current.end == lo
+                and (current.old, current.new) == (a.modifier, b.modifier)
+            ):
+                current = current._replace(end=hi)
+            else:
+                if current is not None:
+                    yield current
+                current = Change(lo, hi, a.modifier, b.modifier)
+        if a.end == hi:
+            a = next(olds, None)
+        if b.end == hi:
+            b = next(news, None)
+    if current is not None:
+        yield current
+
+
+def window(start: dt.datetime, end: dt.datetime) -> dt.datetime:
+    """The end of a window, which includes at least its start"""
+    return max(end, start + EPSILON)
+
+
+def is_open_throughout(
+    rules: Iterable[Rule], start: dt.datetime, end: dt.datetime, loc: LocationInfo
+) -> bool:
+    """Whether rules evaluate to open at all times from start until end (exclusive)"""
+    return open_throughout(segments_of(rules, loc), start, end)
+
+
+def is_open_during(
+    rules: Iterable[Rule], start: dt.datetime, end: dt.datetime, loc: LocationInfo
+) -> bool:
+    """Whether rules evaluate to open at some time from start until end (exclusive)"""
+    return open_during(segments_of(rules, loc), start, end)
+
+
+def open_throughout(
+    segments: Callable[[dt.date], List[Segment]], start: dt.datetime, end: dt.datetime
+) -> bool:
+    """`is_open_throughout` of the day segments given by a function of the date"""
+    return all(
+        interval.modifier.status is RuleStatus.open
+        for interval in walk(segments, start, window(start, end))
+    )
+
+
+def open_during(
+    segments: Callable[[dt.date], List[Segment]], start: dt.datetime, end: dt.datetime
+) -> bool:
+    """`is_open_during` of the day segments given by a function of the date"""
+    return any(
+        interval.modifier.status is RuleStatus.open
+        for interval in walk(segments, start, window(start, end))
+    )
+
+
+def materialize(
+    segments: Callable[[dt.date], List[Segment]],
+    year: int,
+    resolution: dt.timedelta = dt.timedelta(minutes=1),
+) -> Timeline:
+    """The run length encoded statuses of a year, see `timeline`"""
+    start = dt.datetime(year, 1, 1)
+    end = dt.datetime(year + 1, 1, 1)
+    return Timeline.from_intervals(walk(segments, start, end), year, resolution)
+
+
+# features of rules whose day segments depend only on the weekday
+WEEKLY_FEATURES = {Feature.always, Feature.weekdays, Feature.times}
+
+
+class Bucket(Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+def bucket_start(date: dt.date, bucket: Bucket) -> dt.date:
+    if bucket is Bucket.week:
+        return date - dt.timedelta(days=date.weekday())
+    if bucket is Bucket.month:
+        return date.replace(day=1)
+    return date
+
+
+def next_bucket(date: dt.date, bucket: Bucket) -> dt.date:
+    if bucket is Bucket.week:
+        return date + dt.timedelta(days=7)
+    if bucket is Bucket.month:
+        return (date.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+    return date + ONE_DAY
+
+
+def weekday_counts(start: dt.date, end: dt.date) -> List[int]:
+    """The number of each weekday from start (inclusive) to end (exclusive)"""
+    weeks, remainder = divmod(max((end - start).days, 0), 7)
+    counts = [weeks] * 7
+    for d in range(remainder):
+        counts[(start.weekday() + d) % 7] += 1
+    return counts
+
+
+def open_time(
+    segments: Iterable[Segment],
+    start: dt.timedelta = MIDNIGHT,
+    end: dt.timedelta = ONE_DAY,
+) -> dt.timedelta:
+    """The time open between two offsets of a day"""
+    total = dt.timedelta(0)
+    for segment in segments:
+        if segment.modifier.status is RuleStatus.open:
+            total += max(min(end, segment.end) - max(start, segment.start), MIDNIGHT)
+    return total
+
+
+def time_open(
+    segments: Callable[[dt.date], List[Segment]], start: dt.datetime, end: dt.datetime
+) -> dt.timedelta:
+    """The time open from start (inclusive) to end (exclusive), day by day
+
+    Segments should exclude the ends of time spans (see `day_segments`).
+    See `Durations` for rules, which avoids computing the segments of
+    every day.
+    """
+    total = dt.timedelta(0)
+    midnight = dt.datetime.combine(start.date(), dt.time())
+    while midnight < end:
+        lo = max(start - midnight, MIDNIGHT)
+        hi = min(end - midnight, ONE_DAY)
+        total += open_time(segments(midnight.date()), lo, hi)
+        midnight += ONE_DAY
+    return total
+
+
+class Durations:
+    """Open durations of rules over long periods.
+
+    Time spans are measured without their end, e.g. 09:00-17:00 is open
+    for eight hours. Dates are keyed by their weekday and which rules
+    depending on the calendar, holidays or the sun match them: dates with
+    the same key share their open time, so segments are only computed for
+    the few distinct keys and for days matched by sun dependent rules.
+    When rules only depart from their weekly pattern on holidays, only the
+    days around holidays are looked at one by one and the others are
+    counted per weekday.
+    """
+
+    def __init__(self, rules: Iterable[Rule], loc: LocationInfo) -> None:
+        self.rules = list(rules)
+        self.loc = loc
+        features = [selector_features(rule.time_selector) for rule in self.rules]
+        self.sunny = [Feature.sun_events in f for f in features]
+        self.exceptional = [
+            i for i, f in enumerate(features) if not f <= WEEKLY_FEATURES
+        ]
+        self.spilling = [
+            i for i in self.exceptional if self.rules[i].time_selector.spills()
+        ]
+        # days after a holiday on which exceptional rules may match, or None
+        # if they depend on more than holidays and the weekday
+        self.holiday_offsets: Optional[Set[int]] = set()
+        for i in self.exceptional:
+            if not features[i] - WEEKLY_FEATURES <= HOLIDAY_FEATURES:
+                self.holiday_offsets = None
+                break
+            for holiday in self.rules[i].time_selector.weekdays.holidays:
+                self.holiday_offsets.add(holiday.day_offset)
+                if i in self.spilling:
+                    self.holiday_offsets.add(holiday.day_offset + 1)
+        self.cache: Dict[tuple, dt.timedelta] = {}
+
+    def signature(self, date: dt.date) -> tuple:
+        """A key shared by dates with identical segments"""
+        ctx = dt_utils.date_context(date)
+        matched = tuple(
+            i
+            for i in self.exceptional
+            if self.rules[i].time_selector.contains_date(ctx)
+        )
+        # rules carrying over from the previous date
+        previous = dt_utils.date_context(date - ONE_DAY)
+        carried = tuple(
+            i
+            for i in self.spilling
+            if self.rules[i].time_selector.contains_date(previous)
+        )
+        if any(self.sunny[i] for i in matched + carried):
+            return (date,)
+        return (date.weekday(), matched, carried)
+
+    def day(self, date: dt.date) -> dt.timedelta:
+        """The time open over a whole day"""
+        key = self.signature(date)
+        if key not in self.cache:
+            segments = day_segments(self.rules, date, self.loc, closed=False)
+            self.cache[key] = open_time(segments)
+        return self.cache[key]
+
+    def holidays(self, start: dt.date, end: dt.date) -> Set[dt.date]:
+        """The dates from start to end on which exceptional rules may match"""
+        margin = dt.timedelta(days=max(map(abs, self.holiday_offsets), default=0))
+        dates = set()
+        for year in range((start - margin).year, (end + margin).year + 1):
+            for holiday in dt_utils.get_holiday_dates(
+                settings.COUNTRY, settings.STATE, year
+            ):
+                for offset in self.holiday_offsets:
+                    date = holiday + dt.timedelta(days=offset)
+                    if start <= date < end:
+                        dates.add(date)
+        return dates
+
+    def days(self, start: dt.date, end: dt.date) -> dt.timedelta:
+        """The time open over the days from start (inclusive) to end (exclusive)"""
+        total = dt.timedelta(0)
+        if self.holiday_offsets is None:
+            date = start
+            while date < end:
+                total += self.day(date)
+                date += ONE_DAY
+            return total
+        # every other day is open as long as the days of its weekday
+        holidays = self.holidays(start, end)
+        counts = weekday_counts(start, end)
+        for date in holidays:
+            total += self.day(date)
+            counts[date.weekday()] -= 1
+        for weekday, count in enumerate(counts):
+            if count:
+                date = start + dt.timedelta(days=(weekday - start.weekday()) % 7)
+                while date in holidays:
+                    date += dt.timedelta(days=7)
+                total += count * self.day(date)
+        return total
+
+    def between(self, start: dt.datetime, end: dt.datetime) -> dt.timedelta:
+        """The time open from start (inclusive) to end (exclusive)"""
+        if end <= start:
+            return dt.timedelta(0)
+        first, last = start.date(), end.date()
+        start_offset = start - dt.datetime.combine(first, dt.time())
+        end_offset = end - dt.datetime.combine(last, dt.time())
+        if first == last:
+            segments = day_segments(self.rules, first, self.loc, closed=False)
+            return open_time(segments, start_offset, end_offset)
+        total = dt.timedelta(0)
+        if start_offset:
+            segments = day_segments(self.rules, first, self.loc, closed=False)
+            total += open_time(segments, start_offset)
+            first += ONE_DAY
+        if end_offset:
+            segments = day_segments(self.rules, last, self.loc, closed=False)
+            total += open_time(segments, end=end_offset)
+        return total + self.days(first, last)
+
+    def buckets(
+        self, start: dt.datetime, end: dt.datetime, bucket: Bucket
+    ) -> List[Tuple[dt.datetime, dt.timedelta]]:
+        """The time open in each bucket from start to end, keyed by bucket start
+
+        The first and last buckets are clipped to start and end.
+        """
+        totals = []
+        date = bucket_start(start.date(), bucket)
+        while dt.datetime.combine(date, dt.time()) < end:
+            following = next_bucket(date, bucket)
+            lo = max(start, dt.datetime.combine(date, dt.time()))
+            hi = min(end, dt.datetime.combine(following, dt.time()))
+            totals.append((dt.datetime.combine(date, dt.time()), self.between(lo, hi)))
+            date = following
+        return totals
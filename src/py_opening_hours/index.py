@@ -0,0 +1,224 @@
+"""An index of many opening hours answering "what is open at this time?"
+
+Requires numpy (the `columnar` extra). Days are divided into slots of a
+fixed resolution and a place counts as open during a slot if it is open
+at the start of the slot.
+
+Places with equivalent opening hours (see `canonical.fingerprint`) are
+indexed once as a group. The index stores, for every weekday and slot, a
+bitmap (a numpy array of packed bits, one per place) of the places open
+during that slot in a regular week. Dates within the horizon of the index
+on which some group departs from its regular week, e.g. on holidays, store
+the slot patterns of those groups only and queries on those dates flip the
+bits of their places. Outside of the horizon, groups whose opening hours
+depend on the date are evaluated once per group.
+"""
+import datetime as dt
+from collections import Counter
+from typing import Dict, Hashable, List, Mapping, NamedTuple
+
+from astral import LocationInfo
+
+from . import datetime_utils as dt_utils
+from . import solar
+from .analysis import CostClass, Dependency
+from .common import import_optional
+from .data_structures import RuleStatus, ONE_DAY
+from .evaluate import OpenHours
+
+np = import_optional("numpy", "columnar")
+
+# a week of dates, starting on a monday
+REGULAR_WEEK = [dt.date(2024, 1, 1) + dt.timedelta(days=i) for i in range(7)]
+
+
+class Group(NamedTuple):
+    hours: OpenHours
+    loc: LocationInfo
+    static: bool
+
+
+class Override(NamedTuple):
+    """The groups departing from their regular week on a date"""
+
+    groups: np.ndarray
+    patterns: np.ndarray
+
+
+class OpenIndex:
+    def __init__(
+        self,
+        ids: List[Hashable],
+        groups: List[Group],
+        group_of: np.ndarray,
+        regular: np.ndarray,
+        overrides: Dict[dt.date, Override],
+        start: dt.date,
+        end: dt.date,
+        resolution: dt.timedelta,
+    ) -> None:
+        self.ids = ids
+        self.groups = groups
+        # places sorted by group, with the places of group g at
+        # order[offsets[g]:offsets[g + 1]]
+        self.order = np.argsort(group_of, kind="stable")
+        self.offsets = np.searchsorted(
+            group_of[self.order], np.arange(len(groups) + 1), side="left"
+        )
+        # (group, weekday, slot) -> whether the group is open
+        self.regular = regular
+        self.overrides = overrides
+        self.start = start
+        self.end = end
+        self.resolution = resolution
+        self.dynamic = np.array(
+            [g for g, group in enumerate(groups) if not group.static], dtype=np.int64
+        )
+        # (weekday, slot) -> bitmap of places
+        self.weekly = np.stack(
+            [
+                np.packbits(regular[group_of, weekday, :].T, axis=1)
+                for weekday in range(7)
+            ]
+        )
+
+    @classmethod
+    def build(
+        cls,
+        hours: Mapping[Hashable, OpenHours],
+        start: dt.date,
+        end: dt.date,
+        locations: Mapping[Hashable, LocationInfo] = None,
+        resolution: dt.timedelta = dt.timedelta(minutes=15),
+    ) -> "OpenIndex":
+        """Index places by when they are open, with overrides from start to end"""
+        if ONE_DAY % resolution:
+            raise ValueError("The resolution must divide a day.")
+        locations = locations or {}
+        ids = list(hours)
+        groups = []
+        keys = {}
+        group_of = np.empty(len(ids), dtype=np.int64)
+        for i, place in enumerate(ids):
+            place_hours = hours[place]
+            analysis = place_hours.analyze()
+            loc = None
+            if Dependency.location in analysis.dependencies:
+                loc = locations.get(place)
+            key = (
+                place_hours.fingerprint(),
+                None if loc is None else dt_utils.sun_key(loc),
+            )
+            if key not in keys:
+                keys[key] = len(groups)
+                groups.append(
+                    Group(place_hours, loc, analysis.cost is CostClass.static)
+                )
+            group_of[i] = keys[key]
+
+        sunny = [group.loc for group in groups if group.loc is not None]
+        if sunny:
+            solar.precompute(sunny, start, end)
+        nslots = ONE_DAY // resolution
+        dates = [start + dt.timedelta(days=d) for d in range((end - start).days + 1)]
+        regular = np.zeros((len(groups), 7, nslots), dtype=bool)
+        departures = {date: [] for date in dates}
+        for g, group in enumerate(groups):
+            if group.static:
+                for date in REGULAR_WEEK:
+                    regular[g, date.weekday()] = slot_pattern(group, date, resolution)
+                continue
+            patterns = {date: slot_pattern(group, date, resolution) for date in dates}
+            for weekday in range(7):
+                counts = Counter(
+                    patterns[date].tobytes()
+                    for date in dates
+                    if date.weekday() == weekday
+                )
+                if counts:
+                    common = counts.most_common(1)[0][0]
+                    regular[g, weekday] = np.frombuffer(common, dtype=bool)
+            for date, pattern in patterns.items():
+                if (pattern != regular[g, date.weekday()]).any():
+                    departures[date].append((g, pattern))
+        overrides = {
+            date: Override(
+                np.array([g for g, _ in departed], dtype=np.int64),
+                np.stack([pattern for _, pattern in departed]),
+            )
+            for date, departed in departures.items()
+            if departed
+        }
+        return cls(ids, groups, group_of, regular, overrides, start, end, resolution)
+
+    def places(self, groups: np.ndarray) -> np.ndarray:
+        if not len(groups):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(
+            [self.order[self.offsets[g] : self.offsets[g + 1]] for g in groups.tolist()]
+        )
+
+    def bitmap_at(self, datetime: dt.datetime) -> np.ndarray:
+        """The bitmap of places open during the slot containing datetime"""
+        date = datetime.date()
+        weekday = date.weekday()
+        slot = dt_utils.time_to_timedelta(datetime.time()) // self.resolution
+        bitmap = self.weekly[weekday, slot].copy()
+        if self.start <= date <= self.end:
+            override = self.overrides.get(date)
+            if override is None:
+                return bitmap
+            groups = override.groups
+            is_open = override.patterns[:, slot]
+        else:
+            groups = self.dynamic
+            slot_start = dt.datetime.combine(date, dt.time()) + slot * self.resolution
+            is_open = np.array(
+                [is_open_at(self.groups[g], slot_start) for g in groups.tolist()],
+                dtype=bool,
+            )
+        flipped = groups[is_open != self.regular[groups, weekday, slot]]
+        positions = self.places(flipped)
+        np.bitwise_xor.at(
+            bitmap, positions >> 3, (128 >> (positions & 7)).astype(np.uint8)
+        )
+        return bitmap
+
+    def bitmap_between(self, start: dt.datetime, end: dt.datetime) -> np.ndarray:
+        """The bitmap of places open during any slot from start to end"""
+        bitmap = np.zeros_like(self.weekly[0, 0])
+        slot_start = (
+            dt.datetime.combine(start.date(), dt.time())
+            + (dt_utils.time_to_timedelta(start.time()) // self.resolution)
+            * self.resolution
+        )
+        while slot_start <= end:
+            bitmap |= self.bitmap_at(slot_start)
+            slot_start += self.resolution
+        return bitmap
+
+    def to_ids(self, bitmap: np.ndarray) -> List[Hashable]:
+        positions = np.flatnonzero(np.unpackbits(bitmap, count=len(self.ids)))
+        return [self.ids[p] for p in positions.tolist()]
+
+    def open_at(self, datetime: dt.datetime) -> List[Hashable]:
+        return self.to_ids(self.bitmap_at(datetime))
+
+    def open_between(self, start: dt.datetime, end: dt.datetime) -> List[Hashable]:
+        return self.to_ids(self.bitmap_between(start, end))
+
+
+def is_open_at(group: Group, datetime: dt.datetime) -> bool:
+    return group.hours.evaluate(datetime, group.loc).status is RuleStatus.open
+
+
+def slot_pattern(group: Group, date: dt.date, resolution: dt.timedelta) -> np.ndarray:
+    """Whether the group is open at the start of each slot of the day"""
+    pattern = np.zeros(ONE_DAY // resolution, dtype=bool)
+    for segment in group.hours.day_segments(date, group.loc):
+        if segment.modifier.status is RuleStatus.open:
+            # the slots whose start falls in the segment
+            first = -(-segment.start // resolution)
+            last = -(-segment.end // resolution)
+            pattern[first:last] = True
+    return pattern
@@ -0,0 +1,191 @@
+"""Opt-in instrumentation of parsing and evaluation
+
+    from py_opening_hours import instrumentation
+
+    with instrumentation.enabled():
+        hours.evaluate(datetime, loc)
+    stats = instrumentation.snapshot()
+
+While enabled, the instrumented functions are replaced by wrappers that
+count and time calls per phase; disabling restores the originals, so
+instrumentation costs nothing when it is off. Phase timings are inclusive,
+e.g. the time of `Rule.contains` includes that of `TimeSpan.contains`.
+"""
+import contextlib
+import functools
+import importlib
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple
+
+from . import data_structures as ds
+from . import datetime_utils as dt_utils
+from . import syntax
+
+# the package exports the `evaluate` function under the module's name
+ev = importlib.import_module(".evaluate", __package__)
+
+Listener = Callable[[str, float], None]
+
+
+class PhaseStats(NamedTuple):
+    calls: int
+    seconds: float
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+
+
+class Snapshot(NamedTuple):
+    phases: Dict[str, PhaseStats]
+    caches: Dict[str, CacheStats]
+
+
+def _holidays_cached(country, state, year) -> bool:
+    return (country, state, year) in dt_utils.HOLIDAY_DATES
+
+
+def _sun_cached(loc, date, event) -> bool:
+    key = dt_utils.sun_key(loc)
+    return (key, date.year) in dt_utils.SUN_TABLES or (key, date, event) in dt_utils.SUN
+
+
+def timed_targets():
+    """(owner, attribute, phase) of the timed functions"""
+    return [
+        # also times the parses of `parse_cache.parse` missing its cache
+        (syntax, "parse", "parse"),
+        (ev, "evaluate", "evaluate"),
+        (ev, "day_segments", "day_segments"),
+        (ds.Rule, "contains", "Rule.contains"),
+        (ds.TimeSpan, "contains", "TimeSpan.contains"),
+        (ds.TimeSpan, "to_intervals", "TimeSpan.to_intervals"),
+        (ds.Holiday, "contains", "Holiday.contains"),
+        (ds.Event, "to_datetime", "Event.to_datetime"),
+    ]
+
+
+def cache_targets():
+    """(owner, attribute, cache, is_hit) of the cache lookups"""
+    return [
+        (dt_utils, "get_holiday_dates", "holidays", _holidays_cached),
+        (dt_utils, "get_sun_time", "sun", _sun_cached),
+    ]
+
+
+_lock = threading.Lock()
+# guards installing and restoring the instrumented functions
+_install_lock = threading.Lock()
+_originals = {}
+_listeners: List[Listener] = []
+_calls = defaultdict(int)
+_seconds = defaultdict(float)
+_hits = defaultdict(int)
+_misses = defaultdict(int)
+
+
+def _record_call(phase: str, seconds: float) -> None:
+    with _lock:
+        _calls[phase] += 1
+        _seconds[phase] += seconds
+    for listener in list(_listeners):
+        listener(phase, seconds)
+
+
+def _record_lookup(cache: str, hit: bool) -> None:
+    with _lock:
+        if hit:
+            _hits[cache] += 1
+        else:
+            _misses[cache] += 1
+
+
+def _timed(fn, phase: str):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record_call(phase, time.perf_counter() - start)
+
+    return wrapper
+
+
+def _counted(fn, cache: str, is_hit):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        _record_lookup(cache, is_hit(*args, **kwargs))
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def _install(owner, attribute: str, wrapper) -> None:
+    _originals[(owner, attribute)] = owner.__dict__[attribute]
+    setattr(owner, attribute, wrapper)
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    """Start instrumenting; does nothing if already enabled"""
+    with _install_lock:
+        if is_enabled():
+            return
+        for owner, attribute, phase in timed_targets():
+            _install(owner, attribute, _timed(getattr(owner, attribute), phase))
+        for owner, attribute, cache, is_hit in cache_targets():
+            wrapper = _counted(getattr(owner, attribute), cache, is_hit)
+            _install(owner, attribute, wrapper)
+
+
+def disable() -> None:
+    """Stop instrumenting, keeping the statistics collected so far"""
+    with _install_lock:
+        while _originals:
+            (owner, attribute), original = _originals.popitem()
+            setattr(owner, attribute, original)
+
+
+@contextlib.contextmanager
+def enabled():
+    was_enabled = is_enabled()
+    enable()
+    try:
+        yield
+    finally:
+        if not was_enabled:
+            disable()
+
+
+def reset() -> None:
+    with _lock:
+        _calls.clear()
+        _seconds.clear()
+        _hits.clear()
+        _misses.clear()
+
+
+def snapshot() -> Snapshot:
+    with _lock:
+        phases = {phase: PhaseStats(n, _seconds[phase]) for phase, n in _calls.items()}
+        caches = {
+            cache: CacheStats(_hits[cache], _misses[cache])
+            for cache in set(_hits) | set(_misses)
+        }
+    return Snapshot(phases, caches)
+
+
+def add_listener(listener: Listener) -> None:
+    """Call `listener(phase, seconds)` after every instrumented call"""
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Listener) -> None:
+    _listeners.remove(listener)
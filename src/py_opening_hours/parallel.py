@@ -0,0 +1,164 @@
+"""Evaluate very large timestamp arrays across a pool of processes
+
+Requires numpy (the `columnar` extra). Sending chunks of timestamps to
+worker processes and their statuses back costs about as much as
+evaluating them, so `evaluate_shared` places both arrays in shared
+memory instead: every worker attaches to them once, evaluates disjoint
+slices (see `columnar.evaluate_array`) and writes its statuses in place.
+Only the opening hours, location and slice bounds are pickled.
+
+The statuses are returned as a `SharedArray`, whose `array` is backed by
+the shared memory (no copy is made) until the `SharedArray` is closed.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+from astral import LocationInfo
+
+from . import columnar
+from .common import import_optional
+from .evaluate import OpenHours
+
+np = import_optional("numpy", "columnar")
+
+# rows evaluated per task
+CHUNK_SIZE = 1_000_000
+
+# the name, shape and dtype of a shared array, as sent to workers
+Spec = Tuple[str, Tuple[int, ...], str]
+
+
+class SharedArray:
+    """A numpy array in a block of shared memory
+
+    The array is only valid until `close`, after which it must no longer
+    be referenced. The process which created the block frees it on close.
+    """
+
+    def __init__(
+        self,
+        shm: shared_memory.SharedMemory,
+        shape: Tuple[int, ...],
+        dtype: np.dtype,
+        owner: bool,
+    ) -> None:
+        self.shm = shm
+        self.owner = owner
+        self.array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape: Tuple[int, ...], dtype) -> "SharedArray":
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        return cls(shm, shape, dtype, owner=True)
+
+    @classmethod
+    def copy(cls, array: np.ndarray) -> "SharedArray":
+        shared = cls.create(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, spec: Spec) -> "SharedArray":
+        name, shape, dtype = spec
+        return cls(shared_memory.SharedMemory(name=name), shape, np.dtype(dtype), False)
+
+    @property
+    def spec(self) -> Spec:
+        return (self.shm.name, self.array.shape, self.array.dtype.str)
+
+    def close(self) -> None:
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> "SharedArray":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# the state of a worker process, see `attach`
+WORKER: Dict[str, object] = {}
+
+
+def attach(hours: OpenHours, loc: Optional[LocationInfo], inputs: Spec, outputs: Spec):
+    """Initialize a worker with the opening hours and the shared arrays"""
+    WORKER["hours"] = hours
+    WORKER["loc"] = loc
+    WORKER["inputs"] = SharedArray.attach(inputs)
+    WORKER["outputs"] = SharedArray.attach(outputs)
+    # workers leave through os._exit, which skips atexit hooks but not these
+    util.Finalize(None, detach, exitpriority=0)
+
+
+def detach() -> None:
+    """Close the shared arrays of a worker, if still attached"""
+    for key in ("inputs", "outputs"):
+        shared = WORKER.pop(key, None)
+        if shared is not None:
+            shared.close()
+
+
+def evaluate_slice(start: int, stop: int) -> None:
+    timestamps = WORKER["inputs"].array[start:stop]
+    statuses = columnar.evaluate_array(WORKER["hours"], timestamps, WORKER["loc"])
+    WORKER["outputs"].array[start:stop] = statuses
+
+
+def slices(size: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, size, chunk_size):
+        yield start, min(start + chunk_size, size)
+
+
+def evaluate_shared(
+    hours: Union[OpenHours, str],
+    timestamps: Union[np.ndarray, SharedArray],
+    loc: LocationInfo = None,
+    processes: int = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> SharedArray:
+    """Evaluate a one dimensional array of timestamps in worker processes
+
+    Gives the status codes of `columnar.evaluate_array` in a `SharedArray`
+    to close once done with. Timestamps already in a `SharedArray` (of
+    dtype datetime64[us]) are not copied.
+    """
+    if isinstance(hours, str):
+        hours = OpenHours.from_string(hours)
+    if isinstance(timestamps, SharedArray):
+        array = timestamps.array
+    else:
+        array = np.asarray(timestamps, dtype="datetime64[us]")
+    # before copying anything to shared memory
+    if array.ndim != 1:
+        raise ValueError("Timestamps must be one dimensional.")
+    if isinstance(timestamps, SharedArray):
+        inputs, copied = timestamps, None
+    else:
+        inputs = copied = SharedArray.copy(array)
+    size = inputs.array.shape[0]
+    outputs = SharedArray.create((size,), np.int8)
+    try:
+        if size:
+            processes = min(processes or os.cpu_count() or 1, -(-size // chunk_size))
+            with ProcessPoolExecutor(
+                processes,
+                initializer=attach,
+                initargs=(hours, loc, inputs.spec, outputs.spec),
+            ) as executor:
+                bounds = list(slices(size, chunk_size))
+                # raise the first error of a worker, if any
+                list(executor.map(evaluate_slice, *zip(*bounds)))
+    except BaseException:
+        outputs.close()
+        raise
+    finally:
+        if copied is not None:
+            copied.close()
+    return outputs
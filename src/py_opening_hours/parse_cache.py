@@ -0,0 +1,210 @@
+"""A persistent cache of parsed opening hours
+
+Parsing dominates loading large sets of opening hours, and the same
+strings are parsed again by every new process. With
+`settings.PARSE_CACHE_PATH` set, `parse` stores the rules parsed from each
+string in an sqlite database at that path and later processes load them
+from it instead of parsing.
+
+Rules are stored as JSON (see `encode`), keyed by a hash of the string,
+and decoded into the classes of `data_structures` only, so a tampered
+database cannot run code. Every entry records the `grammar_version` it
+was parsed with, a hash of the package version and of the modules
+defining the grammar and the parsed form, and only entries of the running
+version are looked up. Processes of different versions can share a
+database; `purge` drops the entries of other versions. The database uses
+write ahead logging, so any number of processes can read it while one of
+them writes.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from . import __version__
+from . import data_structures as ds
+from . import settings, syntax
+from .common import StripedLock, compute_once
+
+# seconds to wait for another process to finish writing
+TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    key BLOB PRIMARY KEY,
+    version TEXT NOT NULL,
+    data TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+
+@lru_cache(maxsize=None)
+def grammar_version() -> str:
+    """A hash identifying the grammar and the form of the rules it parses"""
+    digest = hashlib.sha256(__version__.encode("utf-8"))
+    for module in (syntax, ds):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def string_key(s: str) -> bytes:
+    return hashlib.sha256(s.encode("utf-8")).digest()
+
+
+# name -> the classes rules are made of, the only ones decoded
+CLASSES = {
+    name: cls
+    for name, cls in vars(ds).items()
+    if isinstance(cls, type)
+    and cls.__module__ == ds.__name__
+    and (issubclass(cls, Enum) or hasattr(cls, "_fields"))
+}
+
+
+def encode(value) -> object:
+    """A JSON value for rules, see `decode`
+
+    Named tuples become [class name, *fields], enum members [class name,
+    member name] and lists and tuples ["list", *items] and ["tuple", *items].
+    """
+    if isinstance(value, Enum):
+        return [type(value).__name__, value.name]
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return [type(value).__name__] + [encode(v) for v in value]
+    if isinstance(value, (list, tuple)):
+        return [type(value).__name__] + [encode(v) for v in value]
+    return value
+
+
+def decode(value) -> object:
+    """The rules of a JSON value from `encode`"""
+    if not isinstance(value, list):
+        return value
+    name, *items = value
+    if name == "list":
+        return [decode(v) for v in items]
+    if name == "tuple":
+        return tuple(decode(v) for v in items)
+    cls = CLASSES[name]
+    if issubclass(cls, Enum):
+        return cls[items[0]]
+    return cls(*(decode(v) for v in items))
+
+
+class ParseCache:
+    def __init__(self, path: str) -> None:
+        self.path = str(path)
+        self.version = grammar_version()
+        # connections can only be used by the thread (and process) opening them
+        self.local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        db = getattr(self.local, "db", None)
+        if db is None or self.local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=TIMEOUT)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(SCHEMA)
+            self.local.db = db
+            self.local.pid = os.getpid()
+        return db
+
+    def get(self, s: str) -> Optional[List[ds.Rule]]:
+        """The cached rules of a string, if any"""
+        row = (
+            self.connection()
+            .execute(
+                "SELECT data FROM rules WHERE key = ? AND version = ?",
+                (string_key(s), self.version),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        try:
+            return decode(json.loads(row[0]))
+        except (ValueError, KeyError, IndexError, TypeError):
+            # not written by this version
+            return None
+
+    def put_many(self, parsed: Dict[str, List[ds.Rule]]) -> None:
+        rows = [
+            (
+                string_key(s),
+                self.version,
+                json.dumps(encode(list(rules)), separators=(",", ":")),
+            )
+            for s, rules in parsed.items()
+        ]
+        with self.connection() as db:
+            db.executemany("INSERT OR REPLACE INTO rules VALUES (?, ?, ?)", rows)
+
+    def put(self, s: str, rules: List[ds.Rule]) -> None:
+        self.put_many({s: rules})
+
+    def parse(self, s: str) -> List[ds.Rule]:
+        rules = self.get(s)
+        if rules is None:
+            rules = list(syntax.parse(s))
+            self.put(s, rules)
+        return rules
+
+    def parse_many(self, strings: Iterable[str]) -> List[List[ds.Rule]]:
+        """Parse strings, storing those not cached yet in one transaction"""
+        parsed = {}
+        result = []
+        for s in strings:
+            rules = parsed.get(s)
+            if rules is None:
+                rules = self.get(s)
+            if rules is None:
+                rules = parsed[s] = list(syntax.parse(s))
+            result.append(rules)
+        if parsed:
+            self.put_many(parsed)
+        return result
+
+    def __len__(self) -> int:
+        """The number of entries of this version"""
+        (n,) = (
+            self.connection()
+            .execute("SELECT COUNT(*) FROM rules WHERE version = ?", (self.version,))
+            .fetchone()
+        )
+        return n
+
+    def purge(self) -> None:
+        """Drop the entries of other versions, e.g. once no longer in use"""
+        with self.connection() as db:
+            db.execute("DELETE FROM rules WHERE version != ?", (self.version,))
+
+    def clear(self) -> None:
+        with self.connection() as db:
+            db.execute("DELETE FROM rules")
+
+    def close(self) -> None:
+        db = getattr(self.local, "db", None)
+        if db is not None:
+            db.close()
+            self.local.db = None
+
+
+# path -> cache
+CACHES: Dict[str, ParseCache] = {}
+LOCKS = StripedLock()
+
+
+def get_cache(path: str) -> ParseCache:
+    return compute_once(CACHES, LOCKS, path, lambda: ParseCache(path))
+
+
+def parse(s: str) -> List[ds.Rule]:
+    """Parse a string, through the persistent cache if there is one"""
+    if settings.PARSE_CACHE_PATH is None:
+        return syntax.parse(s)
+    return get_cache(settings.PARSE_CACHE_PATH).parse(s)
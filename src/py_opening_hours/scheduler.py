@@ -0,0 +1,118 @@
+"""Notify changes in the status of many opening hours as time passes
+
+    scheduler = StatusScheduler(clock=dt.datetime.now)
+    scheduler.add("bakery", OpenHours.from_string("Mo-Sa 07:00-13:00"))
+    ...
+    for change in scheduler.poll():
+        notify(change)
+
+Schedules are kept in a heap keyed by the time of their next change, so
+polling only looks at the schedules that have changed since the last poll
+and only recomputes the next change of those. The clock returns naive
+local times, as expected by `OpenHours.evaluate`.
+"""
+import datetime as dt
+import heapq
+import itertools
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional
+
+from astral import LocationInfo
+
+from .data_structures import Comment, RuleModifier, RuleStatus
+from .evaluate import OpenHours, HORIZON
+
+
+class StatusChange(NamedTuple):
+    id: Hashable
+    time: dt.datetime
+    status: RuleStatus
+    comment: Comment
+
+
+class Entry(NamedTuple):
+    hours: OpenHours
+    loc: LocationInfo
+    modifier: RuleModifier
+    version: int
+
+
+class StatusScheduler:
+    def __init__(
+        self,
+        clock: Callable[[], dt.datetime] = dt.datetime.now,
+        horizon: dt.timedelta = HORIZON,
+    ) -> None:
+        self.clock = clock
+        self.horizon = horizon
+        self._entries: Dict[Hashable, Entry] = {}
+        # (time, tie breaker, id, version, modifier at time or None to recheck)
+        self._heap = []
+        self._counter = itertools.count()
+        self._versions = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, id: Hashable) -> bool:
+        return id in self._entries
+
+    def add(
+        self, id: Hashable, hours: OpenHours, loc: LocationInfo = None
+    ) -> RuleModifier:
+        """Track a schedule (replacing any under the same id), returning its status now"""
+        now = self.clock()
+        modifier = hours.evaluate(now, loc)
+        entry = Entry(hours, loc, modifier, next(self._versions))
+        self._entries[id] = entry
+        self._schedule(id, entry, now)
+        return modifier
+
+    def remove(self, id: Hashable) -> None:
+        del self._entries[id]
+
+    def status(self, id: Hashable) -> RuleModifier:
+        """The status of a schedule as of the last poll"""
+        return self._entries[id].modifier
+
+    def next_time(self) -> Optional[dt.datetime]:
+        """The time of the next change of any schedule"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def poll(self) -> List[StatusChange]:
+        """The changes in status up to now, in order"""
+        now = self.clock()
+        changes = []
+        self._discard_stale()
+        while self._heap and self._heap[0][0] <= now:
+            time, _, id, _, modifier = heapq.heappop(self._heap)
+            entry = self._entries[id]
+            if modifier is not None and modifier != entry.modifier:
+                entry = entry._replace(modifier=modifier)
+                self._entries[id] = entry
+                changes.append(
+                    StatusChange(id, time, modifier.status, modifier.comment)
+                )
+            self._schedule(id, entry, time)
+            self._discard_stale()
+        return changes
+
+    def _schedule(self, id: Hashable, entry: Entry, after: dt.datetime) -> None:
+        change = entry.hours.next_change(after, entry.loc, self.horizon)
+        if change is None:
+            item = (after + self.horizon, None)
+        else:
+            item = (change.start, change.modifier)
+        time, modifier = item
+        heapq.heappush(
+            self._heap, (time, next(self._counter), id, entry.version, modifier)
+        )
+
+    def _discard_stale(self) -> None:
+        """Drop heap items of removed or replaced schedules"""
+        while self._heap:
+            _, _, id, version, _ = self._heap[0]
+            entry = self._entries.get(id)
+            if entry is not None and entry.version == version:
+                return
+            heapq.heappop(self._heap)
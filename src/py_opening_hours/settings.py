@@ -1,2 +1,12 @@
 COUNTRY = "US"
 STATE = None
+# size in degrees of the latitude/longitude grid that observers are snapped
+# to when computing sun events, so that nearby locations share sun tables.
+# None computes sun events at the exact location. See `solar.max_error_minutes`
+SUN_GRID = None
+# cache the rules parsed from each ";" or "||" separated segment of opening
+# hours strings, so that strings sharing segments reuse their parsed rules
+CACHE_RULE_SEGMENTS = False
+# sqlite database caching the rules parsed from opening hours strings across
+# processes, see `parse_cache`. None parses every string
+PARSE_CACHE_PATH = None
@@ -0,0 +1,231 @@
+"""Vectorized calculation of sun events
+
+A numpy implementation of the NOAA algorithm used by `astral.sun`,
+computing dawn, sunrise, sunset and dusk for arrays of dates and
+locations at once. Requires numpy (the `columnar` extra).
+
+`precompute` fills the sun tables consulted by `Event.to_datetime` (see
+`datetime_utils.get_sun_time`) for whole years at a time, so that bulk
+evaluation of sun dependent rules needs no scalar astral calls.
+
+Setting `settings.SUN_GRID` snaps locations to a grid so that all
+locations in a grid cell (and timezone) share a single sun table;
+`max_error_minutes` bounds the error this introduces.
+"""
+import datetime as dt
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from astral import LocationInfo, Observer
+from astral import sun
+
+from . import datetime_utils as dt_utils
+from . import settings
+from .common import import_optional
+
+np = import_optional("numpy", "columnar")
+
+# (zenith, rising) of each event, with astral's default civil depression
+EVENTS = {
+    "dawn": (90.0 + 6.0, True),
+    "sunrise": (90.0 + sun.SUN_APPARENT_RADIUS, True),
+    "sunset": (90.0 + sun.SUN_APPARENT_RADIUS, False),
+    "dusk": (90.0 + 6.0, False),
+}
+# julian day of 1970-01-01 00:00 UTC
+EPOCH_JULIAN_DAY = 2440587.5
+MINUTE = 60_000_000
+UTC_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+# serializes filling the sun tables
+LOCK = threading.Lock()
+
+
+def julian_century(julian_day: np.ndarray) -> np.ndarray:
+    return (julian_day - 2451545.0) / 36525.0
+
+
+def sun_position(t: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """The sun's declination (degrees) and the equation of time (minutes)"""
+    l0 = (280.46646 + t * (36000.76983 + 0.0003032 * t)) % 360.0
+    m = 357.52911 + t * (35999.05029 - 0.0001537 * t)
+    e = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    mrad = np.radians(m)
+    c = (
+        np.sin(mrad) * (1.914602 - t * (0.004817 + 0.000014 * t))
+        + np.sin(2 * mrad) * (0.019993 - 0.000101 * t)
+        + np.sin(3 * mrad) * 0.000289
+    )
+    omega = np.radians(125.04 - 1934.136 * t)
+    apparent_long = np.radians(l0 + c - 0.00569 - 0.00478 * np.sin(omega))
+    seconds = 21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))
+    obliquity = np.radians(
+        23.0 + (26.0 + (seconds / 60.0)) / 60.0 + 0.00256 * np.cos(omega)
+    )
+    declination = np.degrees(np.arcsin(np.sin(obliquity) * np.sin(apparent_long)))
+
+    y = np.tan(obliquity / 2.0) ** 2
+    l0rad = np.radians(l0)
+    eq_of_time = 4.0 * np.degrees(
+        y * np.sin(2.0 * l0rad)
+        - 2.0 * e * np.sin(mrad)
+        + 4.0 * e * y * np.sin(mrad) * np.cos(2.0 * l0rad)
+        - 0.5 * y * y * np.sin(4.0 * l0rad)
+        - 1.25 * e * e * np.sin(2.0 * mrad)
+    )
+    return declination, eq_of_time
+
+
+def hour_angle(latitude, declination, zenith, rising: bool) -> np.ndarray:
+    """The hour angle (radians), nan when the zenith is never reached"""
+    latitude = np.radians(latitude)
+    declination = np.radians(declination)
+    h = (np.cos(np.radians(zenith)) - np.sin(latitude) * np.sin(declination)) / (
+        np.cos(latitude) * np.cos(declination)
+    )
+    with np.errstate(invalid="ignore"):
+        angle = np.arccos(h)
+    return angle if rising else -angle
+
+
+def elevation_adjustment(observer: Observer) -> float:
+    if isinstance(observer.elevation, float) and observer.elevation > 0.0:
+        return sun.adjust_to_horizon(observer.elevation)
+    if isinstance(observer.elevation, tuple):
+        return sun.adjust_to_obscuring_feature(observer.elevation)
+    return 0.0
+
+
+def time_of_transit(
+    days: np.ndarray, observers: List[Observer], zenith: float, rising: bool
+) -> np.ndarray:
+    """Minutes after midnight UTC at which the sun transits the zenith
+
+    The result has shape (len(days), len(observers)), with nan where the
+    sun does not reach the zenith. `days` are days since 1970-01-01.
+    This follows `astral.sun.time_of_transit` step by step.
+    """
+    julian_day = np.asarray(days, dtype=np.float64)[:, None] + EPOCH_JULIAN_DAY
+    latitude = np.clip([o.latitude for o in observers], -89.8, 89.8)
+    longitude = np.array([o.longitude for o in observers], dtype=np.float64)
+    adjustment = np.array([elevation_adjustment(o) for o in observers])
+    refraction = np.array(
+        [sun.refraction_at_zenith(zenith + a) for a in adjustment.tolist()]
+    )
+
+    t = julian_century(julian_day)
+    declination, eq_of_time = sun_position(t)
+    angle = hour_angle(latitude, declination, zenith + adjustment - refraction, rising)
+    minutes = 720.0 + 4.0 * (-longitude - np.degrees(angle)) - eq_of_time
+
+    t = julian_century(julian_day + minutes / 1440.0)
+    declination, eq_of_time = sun_position(t)
+    angle = hour_angle(latitude, declination, zenith + adjustment + refraction, rising)
+    return 720.0 + 4.0 * (-longitude - np.degrees(angle)) - eq_of_time
+
+
+def sun_times(dates: np.ndarray, observers: List[Observer]) -> Dict[str, np.ndarray]:
+    """UTC times of each event for every date and observer
+
+    Returns datetime64[us] arrays of shape (len(dates), len(observers)),
+    NaT where the event does not occur.
+    """
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    times = {}
+    for event, (zenith, rising) in EVENTS.items():
+        minutes = time_of_transit(days, observers, zenith, rising)
+        missing = np.isnan(minutes)
+        micros = days[:, None] * (1440 * MINUTE) + np.floor(
+            np.where(missing, 0.0, minutes) * MINUTE
+        ).astype(np.int64)
+        times[event] = np.where(
+            missing, np.datetime64("NaT"), micros.astype("datetime64[us]")
+        )
+    return times
+
+
+class SunTable(NamedTuple):
+    """A year of sun events at a location"""
+
+    year: int
+    tzinfo: dt.tzinfo
+    times: Dict[str, np.ndarray]
+
+    def get(self, date: dt.date, event: str) -> dt.datetime:
+        micros = self.times[event][date.timetuple().tm_yday - 1]
+        if np.isnat(micros):
+            raise ValueError(f"The sun does not {event} on {date} at this location.")
+        offset = dt.timedelta(microseconds=int(micros.astype(np.int64)))
+        return (UTC_EPOCH + offset).astimezone(self.tzinfo)
+
+
+def year_dates(year: int) -> np.ndarray:
+    return np.arange(f"{year}-01-01", f"{year + 1}-01-01", dtype="datetime64[D]")
+
+
+def precompute(locations: Iterable[LocationInfo], start: dt.date, end: dt.date) -> None:
+    """Fill the sun tables of the locations for every year from start to end"""
+    locations = {dt_utils.sun_key(loc): loc for loc in locations}
+    with LOCK:
+        for year in range(start.year, end.year + 1):
+            precompute_year(locations, year)
+
+
+def precompute_year(locations: Dict[Tuple, LocationInfo], year: int) -> None:
+    missing = [
+        loc for key, loc in locations.items() if (key, year) not in dt_utils.SUN_TABLES
+    ]
+    if not missing:
+        return
+    times = sun_times(year_dates(year), [dt_utils.sun_observer(loc) for loc in missing])
+    for i, loc in enumerate(missing):
+        # tables are read without locks, so they must not change once added
+        table = {event: t[:, i].copy() for event, t in times.items()}
+        for t in table.values():
+            t.flags.writeable = False
+        dt_utils.SUN_TABLES[(dt_utils.sun_key(loc), year)] = SunTable(
+            year, loc.tzinfo, table
+        )
+
+
+def cell_errors(latitudes: Iterable[float], grid: float, year: int) -> np.ndarray:
+    """The largest error in the sun events of grid cells, in minutes
+
+    This compares the events at the corners of the grid cells containing
+    each latitude with those at their centers over a year. Events that do
+    not occur at either point are ignored. Errors do not depend on the
+    longitude of the cell.
+    """
+    observers = []
+    for latitude in latitudes:
+        center = dt_utils.snap_to_grid(latitude, grid)
+        observers.append(Observer(center, 0.0))
+        for dlat in (-1, 1):
+            for dlon in (-1, 1):
+                corner = float(np.clip(center + dlat * grid / 2, -90.0, 90.0))
+                observers.append(Observer(corner, dlon * grid / 2))
+    errors = np.zeros(len(observers) // 5)
+    for t in sun_times(year_dates(year), observers).values():
+        t = t.reshape(len(t), -1, 5)
+        diff = np.abs(t[:, :, 1:] - t[:, :, :1]).astype(np.float64) / MINUTE
+        diff[np.isnat(t[:, :, 1:] - t[:, :, :1])] = 0.0
+        errors = np.maximum(errors, diff.max(axis=(0, 2)))
+    return errors
+
+
+def max_error_minutes(latitude: float, grid: float = None, year: int = 2022) -> float:
+    """The largest error in sun events, in minutes, in the grid cell of a latitude"""
+    grid = settings.SUN_GRID if grid is None else grid
+    if grid is None:
+        return 0.0
+    return float(cell_errors([latitude], grid, year)[0])
+
+
+def grid_error_minutes(
+    grid: float = None, max_latitude: float = 60.0, year: int = 2022
+) -> float:
+    """The largest error in sun events, in minutes, of grid cells up to a latitude"""
+    grid = settings.SUN_GRID if grid is None else grid
+    if grid is None:
+        return 0.0
+    latitudes = np.arange(-max_latitude, max_latitude + grid, grid).tolist()
+    return float(cell_errors(latitudes, grid, year).max())
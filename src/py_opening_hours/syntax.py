@@ -2,19 +2,18 @@
 
 https://wiki.openstreetmap.org/wiki/Key:opening_hours/specification
 """
-from typing import Iterable, List
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
 import pyparsing as pp
 from . import data_structures as ds
+from . import settings
 
 comma = pp.Literal(",")
 
 ppc = pp.pyparsing_common
 
 
-def as_two_digit_string(num: int) -> str:
-    return f"{num:02d}"
-
-
 def integers(start: int, stop: int) -> Iterable[int]:
     """Inclusive range"""
     return list(range(start, stop + 1))
@@ -72,18 +71,13 @@ daynum = two_digit_number.set_results_name("daynum")
 wday = pp.one_of(["Su", "Mo", "Tu", "We", "Th", "Fr", "Sa"]).add_parse_action(
     ds.DayOfWeek.load
 )
-minute = pp.one_of(map(as_two_digit_string, integers(0, 59))).set_parse_action(
-    ppc.convert_to_integer
-)
-hour = pp.one_of(map(as_two_digit_string, integers(0, 24))).set_parse_action(
-    ppc.convert_to_integer
-)
+# two digit minutes (00-59) and hours (00-24, or 00-48 when extended)
+minute = pp.Regex(r"[0-5][0-9]").set_parse_action(ppc.convert_to_integer)
+hour = pp.Regex(r"[01][0-9]|2[0-4]").set_parse_action(ppc.convert_to_integer)
 hour_minutes = (hour("hh") + pp.Suppress(":") + minute("mm")).set_parse_action(
     ds.Time.load
 )
-extended_hour = hour | pp.one_of(
-    map(as_two_digit_string, integers(25, 48))
-).set_parse_action(ppc.convert_to_integer)
+extended_hour = pp.Regex(r"[0-3][0-9]|4[0-8]").set_parse_action(ppc.convert_to_integer)
 extended_hour_minutes = (
     extended_hour("hh") + pp.Suppress(":") + minute("mm")
 ).set_parse_action(ds.Time.load)
@@ -189,17 +183,18 @@ event = (
 variable_time = (
     event | (pp.Suppress("(") + event + plus_or_minus + hour_minutes + pp.Suppress(")"))
 ).set_parse_action(ds.VariableTime.load)
-extended_time = extended_hour_minutes | variable_time
 time = (hour_minutes | variable_time).set_parse_action(ds.ExtendedTime.load)
+# spans may end after midnight, e.g. "Fr 18:00-26:00"
+extended_time = (extended_hour_minutes | variable_time).set_parse_action(
+    ds.ExtendedTime.load
+)
 timespan = (
-    (time | time).set_results_name(
-        "start_time"
-    )  # this is a hack to get avoid `{'start_time': None}`
+    pp.Group(time).set_results_name("start_time")
     + pp.Opt(
         pp.Literal("+").set_results_name("open_end")
         | (
             range_op
-            + (time | time).set_results_name("end_time")
+            + pp.Group(extended_time).set_results_name("end_time")
             + pp.Opt(
                 pp.Literal("+").set_results_name("open_end")
                 | (
@@ -257,5 +252,142 @@ time_domain = pp.delimited_list(
 ).set_results_name("rules")
 
 
+# number of distinct rule segments kept by the segment cache
+SEGMENT_CACHE_SIZE = 4096
+
+
+def split_rules(s: str) -> List[str]:
+    """Split a time domain on ";" and "||" separators outside of comments
+
+    "," also separates rules but is ambiguous with lists within selectors,
+    so it is left inside the segments.
+    """
+    segments = []
+    start = 0
+    quoted = False
+    i = 0
+    while i < len(s):
+        char = s[i]
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and (char == ";" or s.startswith("||", i)):
+            segments.append(s[start:i])
+            i += 1 if char == ";" else 2
+            start = i
+            continue
+        i += 1
+    segments.append(s[start:])
+    return segments
+
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def parse_segment(segment: str) -> Tuple[ds.Rule, ...]:
+    return tuple(time_domain.parse_string(segment, parse_all=True).rules)
+
+
+def parse_segments(s: str) -> List[ds.Rule]:
+    """Parse a time domain reusing the rules of previously parsed segments
+
+    Falls back to parsing the whole string when a segment does not parse
+    completely, e.g. when trailing text would be ignored, so that the
+    result is always that of parsing the whole string.
+    """
+    try:
+        return [rule for segment in split_rules(s) for rule in parse_segment(segment)]
+    except pp.ParseException:
+        return time_domain.parse_string(s).rules
+
+
 def parse(s: str) -> List[ds.Rule]:
+    if settings.CACHE_RULE_SEGMENTS:
+        return parse_segments(s)
     return time_domain.parse_string(s).rules
+
+
+# Validation
+#
+# Strings are valid when the whole string parses. `prescan` looks at the
+# tokens of a string only, rejecting strings containing anything that no
+# token of the grammar can match before running the grammar itself.
+
+# the words of the grammar, outside of comments
+WORDS = {
+    *("Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split()),
+    *("Su Mo Tu We Th Fr Sa PH SH".split()),
+    *("easter day days dawn sunrise sunset dusk".split()),
+    *("open closed off unknown".split()),
+}
+# whitespace skipped by pyparsing, and the punctuation of the grammar
+SEPARATORS = set(" \t\n\r") | set(";,|:-+/")
+BRACKETS = {"]": "[", ")": "("}
+letters = re.compile(r"[A-Za-z]+")
+
+
+class ParseError(NamedTuple):
+    position: int
+    message: str
+
+
+def is_words(text: str) -> bool:
+    """Whether text is a concatenation of words of the grammar"""
+    # ends[i] is whether text[:i] is a concatenation of words
+    ends = [True] + [False] * len(text)
+    for i in range(len(text)):
+        if not ends[i]:
+            continue
+        for j in range(i + 2, min(len(text), i + 7) + 1):
+            word = text[i:j]
+            if word in WORDS or word.lower() == "week":
+                ends[j] = True
+    return ends[-1]
+
+
+def prescan(s: str) -> Optional[ParseError]:
+    """A lexical check that rejects some (but not all) invalid strings
+
+    Never rejects a string that parses completely.
+    """
+    brackets = []
+    i = 0
+    while i < len(s):
+        char = s[i]
+        if char == '"':
+            end = s.find('"', i + 1)
+            if end < 0:
+                return ParseError(i, "Unterminated comment")
+            i = end + 1
+            continue
+        if char.isalpha():
+            match = letters.match(s, i)
+            if match is None:
+                return ParseError(i, f"Unexpected character {char!r}")
+            if not is_words(match.group()):
+                return ParseError(i, f"Unexpected word {match.group()!r}")
+            i = match.end()
+            continue
+        if char in BRACKETS.values():
+            brackets.append(char)
+        elif char in BRACKETS:
+            if not brackets or brackets.pop() != BRACKETS[char]:
+                return ParseError(i, f"Unbalanced {char!r}")
+        elif not (char.isdigit() and char.isascii()) and char not in SEPARATORS:
+            return ParseError(i, f"Unexpected character {char!r}")
+        i += 1
+    if brackets:
+        return ParseError(s.rindex(brackets[-1]), f"Unbalanced {brackets[-1]!r}")
+    return None
+
+
+def try_parse(s: str) -> Union[List[ds.Rule], ParseError]:
+    """Parse a whole string, returning a `ParseError` if it is invalid"""
+    error = prescan(s)
+    if error is not None:
+        return error
+    try:
+        return list(time_domain.parse_string(s, parse_all=True).rules)
+    except pp.ParseException as e:
+        return ParseError(e.loc, e.msg)
+
+
+def is_valid(s: str) -> bool:
+    return not isinstance(try_parse(s), ParseError)
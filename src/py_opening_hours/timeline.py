@@ -0,0 +1,135 @@
+"""A year of status, run length encoded
+
+A `Timeline` stores the statuses of opening hours over a year as runs:
+the slot (a multiple of the resolution after the start of the year) at
+which each run starts and its status. Building one only touches the
+changes in status and looking up a datetime bisects the run starts, so
+clients can answer queries for the year without parsing or evaluating.
+
+Slots take the status at their start, as in `index`: with a resolution
+of a minute, "09:00-17:00" is open from the 09:00 slot through the 17:00
+slot. Comments are not kept.
+"""
+import bisect
+import datetime as dt
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from .data_structures import RuleStatus, ONE_DAY
+
+MAGIC = b"OHTL"
+VERSION = 1
+# magic, version, year, resolution (microseconds), number of runs
+HEADER = struct.Struct("<4sBHQI")
+
+
+class Run(NamedTuple):
+    start: dt.datetime
+    end: dt.datetime
+    status: RuleStatus
+
+
+class Timeline:
+    def __init__(
+        self, year: int, resolution: dt.timedelta, starts: array, statuses: bytes
+    ) -> None:
+        self.year = year
+        self.resolution = resolution
+        # slot of the start of each run, the first being 0
+        self.starts = starts
+        # RuleStatus.value of each run
+        self.statuses = statuses
+
+    @property
+    def start(self) -> dt.datetime:
+        return dt.datetime(self.year, 1, 1)
+
+    @property
+    def end(self) -> dt.datetime:
+        return dt.datetime(self.year + 1, 1, 1)
+
+    @classmethod
+    def from_intervals(
+        cls, intervals: Iterable, year: int, resolution: dt.timedelta
+    ) -> "Timeline":
+        """Build the timeline of the year from consecutive intervals covering it
+
+        See `evaluate.intervals`.
+        """
+        if ONE_DAY % resolution:
+            raise ValueError("The resolution must divide a day.")
+        start = dt.datetime(year, 1, 1)
+        nslots = (dt.datetime(year + 1, 1, 1) - start) // resolution
+        starts = array("I")
+        statuses = bytearray()
+        for interval in intervals:
+            # the first slot starting within the interval
+            slot = -(-(interval.start - start) // resolution)
+            if slot >= nslots:
+                break
+            status = interval.modifier.status.value
+            if starts and starts[-1] == slot:
+                # the previous run is shorter than a slot
+                starts.pop()
+                statuses.pop()
+            if statuses and statuses[-1] == status:
+                continue
+            starts.append(slot)
+            statuses.append(status)
+        return cls(year, resolution, starts, bytes(statuses))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Timeline) and self.to_bytes() == other.to_bytes()
+
+    def slot(self, datetime: dt.datetime) -> int:
+        if not self.start <= datetime < self.end:
+            raise ValueError(f"{datetime} is not in {self.year}.")
+        return (datetime - self.start) // self.resolution
+
+    def run_index(self, datetime: dt.datetime) -> int:
+        return bisect.bisect_right(self.starts, self.slot(datetime)) - 1
+
+    def status_at(self, datetime: dt.datetime) -> RuleStatus:
+        return RuleStatus(self.statuses[self.run_index(datetime)])
+
+    def runs(self) -> Iterator[Run]:
+        ends = list(self.starts[1:]) + [(self.end - self.start) // self.resolution]
+        for start, end, status in zip(self.starts, ends, self.statuses):
+            yield Run(
+                self.start + start * self.resolution,
+                self.start + end * self.resolution,
+                RuleStatus(status),
+            )
+
+    def next_change(self, datetime: dt.datetime) -> Optional[dt.datetime]:
+        """The start of the run after the one containing datetime, if any"""
+        i = self.run_index(datetime) + 1
+        if i < len(self.starts):
+            return self.start + self.starts[i] * self.resolution
+        return None
+
+    def to_bytes(self) -> bytes:
+        starts = array("I", self.starts)
+        if sys.byteorder == "big":
+            starts.byteswap()
+        resolution = self.resolution // dt.timedelta(microseconds=1)
+        header = HEADER.pack(MAGIC, VERSION, self.year, resolution, len(starts))
+        return header + starts.tobytes() + self.statuses
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Timeline":
+        magic, version, year, resolution, n = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a serialized timeline.")
+        offset = HEADER.size
+        starts = array("I")
+        starts.frombytes(data[offset : offset + 4 * n])
+        if sys.byteorder == "big":
+            starts.byteswap()
+        statuses = bytes(data[offset + 4 * n : offset + 5 * n])
+        return cls(year, dt.timedelta(microseconds=resolution), starts, statuses)
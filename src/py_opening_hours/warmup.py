@@ -0,0 +1,140 @@
+"""Fill caches ahead of time
+
+The first evaluation touching a new year, region or location pays for
+expanding holiday calendars and computing sun events, and the first
+evaluation of an opening hours string pays for parsing (and compiling)
+it. `warmup` does that work up front, e.g. on deploy or before new year,
+and `start_warmup` does it in a background thread.
+"""
+import datetime as dt
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, NamedTuple, Optional, Tuple, Union
+
+from astral import LocationInfo
+
+from . import datetime_utils as dt_utils
+from . import settings
+from .evaluate import OpenHours
+
+try:
+    from . import solar
+except ImportError:  # numpy is not installed
+    solar = None
+
+Region = Union[str, Tuple[str, Optional[str]]]
+
+
+class Warmed(NamedTuple):
+    items: int
+    seconds: float
+
+
+class WarmupReport(NamedTuple):
+    # dates whose `dt_utils.DateContext` was computed
+    dates: Warmed
+    # (country, state, year) holiday calendars
+    holidays: Warmed
+    # (location, year) of sun events
+    sun: Warmed
+    # opening hours strings parsed into a cache, and compiled if asked to
+    strings: Warmed
+    seconds: float
+
+
+def year_dates(year: int) -> Iterable[dt.date]:
+    date = dt.date(year, 1, 1)
+    while date.year == year:
+        yield date
+        date += dt.timedelta(days=1)
+
+
+def as_region(region: Region) -> Tuple[str, Optional[str]]:
+    if isinstance(region, str):
+        return (region, None)
+    return tuple(region)
+
+
+def warm_sun(locations: Iterable[LocationInfo], year: int) -> None:
+    if solar is not None:
+        start = dt.date(year, 1, 1)
+        solar.precompute(locations, start, dt.date(year, 12, 31))
+        return
+    for loc in locations:
+        for date in year_dates(year):
+            for event in dt_utils.SUN_EVENTS:
+                try:
+                    dt_utils.get_sun_time(loc, date, event)
+                except ValueError:
+                    # the sun does not reach this position on the date
+                    pass
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def warmup(
+    years: Iterable[int] = None,
+    regions: Iterable[Region] = None,
+    locations: Iterable[LocationInfo] = None,
+    strings: Iterable[str] = None,
+    compile_rules: bool = True,
+) -> WarmupReport:
+    """Fill the caches used to evaluate opening hours
+
+    Years default to this year and the next, and regions to the one in
+    `settings`. Strings are parsed (through the segment and persistent
+    parse caches if they are enabled) and, if `compile_rules`, compiled (see
+    `codegen`). Without either, parsing would fill no cache and is skipped.
+    """
+    started = time.perf_counter()
+    if years is None:
+        today = dt.date.today()
+        years = [today.year, today.year + 1]
+    years = list(years)
+    if regions is None:
+        regions = [(settings.COUNTRY, settings.STATE)]
+    regions = [as_region(region) for region in regions]
+    locations = list(locations or [])
+    strings = list(strings or [])
+    caching = settings.CACHE_RULE_SEGMENTS or settings.PARSE_CACHE_PATH is not None
+    if not (caching or compile_rules):
+        strings = []
+
+    def warm_dates():
+        for year in years:
+            for date in year_dates(year):
+                dt_utils.date_context(date)
+
+    def warm_holidays():
+        for country, state in regions:
+            for year in years:
+                dt_utils.get_holiday_dates(country, state, year)
+
+    def warm_locations():
+        for year in years:
+            warm_sun(locations, year)
+
+    def warm_strings():
+        for s in strings:
+            hours = OpenHours.from_string(s)
+            if compile_rules:
+                hours.compile()
+
+    ndates = sum((dt.date(year + 1, 1, 1) - dt.date(year, 1, 1)).days for year in years)
+    dates = Warmed(ndates, timed(warm_dates))
+    holidays = Warmed(len(regions) * len(years), timed(warm_holidays))
+    sun = Warmed(len(locations) * len(years), timed(warm_locations))
+    parsed = Warmed(len(strings), timed(warm_strings))
+    return WarmupReport(dates, holidays, sun, parsed, time.perf_counter() - started)
+
+
+def start_warmup(*args, **kwargs) -> "Future[WarmupReport]":
+    """Run `warmup` in a background thread"""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+    future = executor.submit(warmup, *args, **kwargs)
+    executor.shutdown(wait=False)
+    return future
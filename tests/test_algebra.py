@@ -0,0 +1,138 @@
+import datetime as dt
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from py_opening_hours import algebra
+from py_opening_hours.algebra import (
+    Operation,
+    combine,
+    complement,
+    difference,
+    intersection,
+    union,
+)
+from py_opening_hours.data_structures import RuleStatus
+from py_opening_hours.evaluate import OpenHours
+
+STORE = OpenHours.from_string("Mo-Fr 09:00-17:00; Sa 10:00-14:00")
+PHARMACY = OpenHours.from_string("Mo-Sa 08:00-12:00; We 14:00-16:00 unknown")
+HOLIDAYS = OpenHours.from_string("Mo-Su 11:00-13:00; PH off")
+
+
+def statuses(hours, datetimes, loc=None):
+    return [hours.evaluate(datetime, loc).status for datetime in datetimes]
+
+
+def quarter_hours(start, days):
+    return [start + dt.timedelta(minutes=15 * i) for i in range(days * 24 * 4)]
+
+
+def test_combine():
+    o, c, u = RuleStatus.open, RuleStatus.closed, RuleStatus.unknown
+    assert combine(Operation.union, [c, u]) is u
+    assert combine(Operation.union, [o, u]) is o
+    assert combine(Operation.intersection, [o, u]) is u
+    assert combine(Operation.intersection, [c, u]) is c
+    assert combine(Operation.difference, [o, c]) is o
+    assert combine(Operation.difference, [o, u]) is u
+    assert combine(Operation.difference, [u, o]) is c
+    assert combine(Operation.complement, [u]) is u
+
+
+def test_matches_operands():
+    datetimes = quarter_hours(dt.datetime(2022, 6, 6), 7)
+    datetimes += [d + dt.timedelta(seconds=30) for d in datetimes]
+    operations = {
+        Operation.union: union(STORE, PHARMACY),
+        Operation.intersection: intersection(STORE, PHARMACY),
+        Operation.difference: difference(STORE, PHARMACY),
+        Operation.complement: complement(STORE),
+    }
+    for operation, combined in operations.items():
+        operands = [STORE] if operation is Operation.complement else [STORE, PHARMACY]
+        for datetime in datetimes:
+            expected = combine(
+                operation, [hours.evaluate(datetime).status for hours in operands]
+            )
+            assert combined.evaluate(datetime).status is expected
+
+
+def test_boundaries():
+    free = complement(STORE)
+    monday = dt.datetime(2022, 6, 6)
+    assert free.evaluate(monday.replace(hour=17)).status is RuleStatus.closed
+    assert (
+        free.evaluate(monday.replace(hour=17, microsecond=1)).status is RuleStatus.open
+    )
+    change = free.next_change(monday.replace(hour=12))
+    assert change.start == monday.replace(hour=17, microsecond=1)
+    assert change.modifier.status is RuleStatus.open
+
+
+def test_operators():
+    a = union(STORE, PHARMACY)
+    b = a & HOLIDAYS
+    c = ~(a - HOLIDAYS)
+    assert a.weekly and b.weekly is False
+    datetimes = quarter_hours(dt.datetime(2022, 7, 1), 7)
+    assert statuses(b, datetimes) == [
+        combine(
+            Operation.intersection,
+            [a.evaluate(d).status, HOLIDAYS.evaluate(d).status],
+        )
+        for d in datetimes
+    ]
+    assert statuses(c, datetimes) == [
+        combine(
+            Operation.complement,
+            [combine(Operation.difference, [a.evaluate(d).status, s])],
+        )
+        for d, s in zip(datetimes, statuses(HOLIDAYS, datetimes))
+    ]
+
+
+def test_queries():
+    both = intersection(STORE, PHARMACY)
+    monday = dt.datetime(2022, 6, 6)
+    assert both.is_open_throughout(monday.replace(hour=9), monday.replace(hour=12))
+    assert not both.is_open_throughout(monday.replace(hour=9), monday.replace(hour=13))
+    assert both.is_open_during(monday.replace(hour=11), monday.replace(hour=13))
+    assert not both.is_open_during(monday.replace(hour=13), monday.replace(hour=17))
+    week = both.open_duration(monday, monday + dt.timedelta(days=7))
+    # 3 hours a weekday and 2 on saturday
+    assert week == 5 * dt.timedelta(hours=3) + dt.timedelta(hours=2)
+    intervals = list(both.intervals(monday, monday + dt.timedelta(days=7)))
+    assert all(a.end == b.start for a, b in zip(intervals, intervals[1:]))
+    assert all(
+        a.modifier != b.modifier for a, b in zip(intervals, intervals[1:])
+    ), "intervals are maximal"
+
+
+def test_materialize(pittsburgh_location_spec):
+    sun = OpenHours.from_string("Mo-Su sunrise-sunset")
+    daylight_shopping = intersection(STORE, sun)
+    assert not daylight_shopping.weekly
+    timeline = daylight_shopping.materialize(
+        2022, pittsburgh_location_spec, dt.timedelta(hours=1)
+    )
+    datetime = dt.datetime(2022, 1, 1)
+    while datetime.year == 2022:
+        expected = daylight_shopping.evaluate(datetime, pittsburgh_location_spec)
+        assert timeline.status_at(datetime) is expected.status
+        datetime += dt.timedelta(hours=37)
+
+
+def test_concurrent_days(monkeypatch):
+    monkeypatch.setattr(algebra, "DAYS_CACHED", 5)
+    combined = difference(STORE, HOLIDAYS)
+    datetimes = quarter_hours(dt.datetime(2022, 12, 20), 14)
+    expected = statuses(combined, datetimes)
+    barrier = threading.Barrier(8)
+
+    def work(_):
+        barrier.wait()
+        return statuses(combined, datetimes)
+
+    with ThreadPoolExecutor(8) as pool:
+        assert all(result == expected for result in pool.map(work, range(8)))
+    assert len(combined.cache) <= 5
@@ -0,0 +1,56 @@
+from py_opening_hours.analysis import (
+    Analysis,
+    CostClass,
+    Dependency,
+    FastPath,
+    Feature,
+)
+from py_opening_hours.evaluate import OpenHours
+
+
+def test_static():
+    analysis = OpenHours.from_string("Mo-Fr 09:00-17:00; Sa 10:00-12:00").analyze()
+    assert analysis == Analysis(
+        CostClass.static,
+        FastPath.weekly,
+        frozenset(),
+        frozenset({Feature.weekdays, Feature.times}),
+    )
+
+
+def test_constant():
+    for s in ["24/7", "24/7 closed", '"only after registration"']:
+        analysis = OpenHours.from_string(s).analyze()
+        assert analysis.cost is CostClass.static
+        assert analysis.fast_path is FastPath.constant
+
+
+def test_calendar():
+    for s in ["week 2-52/2 We 00:00-24:00", "Sa[1] 10:00-12:00", "2022+ Mo"]:
+        analysis = OpenHours.from_string(s).analyze()
+        assert analysis.cost is CostClass.calendar
+        assert analysis.fast_path is FastPath.daily
+        assert analysis.dependencies == frozenset()
+    analysis = OpenHours.from_string("Jan 23-Feb 11 08:00-12:00").analyze()
+    assert analysis.features == frozenset({Feature.monthdays, Feature.times})
+
+
+def test_holiday():
+    analysis = OpenHours.from_string("Mo-Fr 10:00-20:00; PH off").analyze()
+    assert analysis.cost is CostClass.holiday
+    assert analysis.fast_path is FastPath.daily
+    assert analysis.dependencies == frozenset({Dependency.region})
+    assert Feature.public_holidays in analysis.features
+
+
+def test_location():
+    analysis = OpenHours.from_string("Mo-Fr sunrise-sunset; PH off").analyze()
+    assert analysis.cost is CostClass.location
+    assert analysis.fast_path is FastPath.general
+    assert analysis.dependencies == frozenset({Dependency.region, Dependency.location})
+    assert Feature.sun_events in analysis.features
+
+
+def test_example(opening_hours_example):
+    analysis = OpenHours.from_string(opening_hours_example).analyze()
+    assert isinstance(analysis.cost, CostClass)
@@ -0,0 +1,25 @@
+from benchmarks import suite
+from benchmarks.__main__ import benchmarks, compare
+
+
+def test_benchmarks_run():
+    names = []
+    for name, cls, method_name in benchmarks():
+        instance = cls()
+        instance.setup()
+        getattr(instance, method_name)()
+        names.append(name)
+    assert "Parse.time_parse_corpus" in names
+    assert "Sun.time_event_to_datetime" in names
+
+
+def test_corpus():
+    corpus = suite.corpus()
+    assert len(corpus) > 20
+    assert all(s and not s.startswith("#") for s in corpus)
+
+
+def test_compare():
+    baseline = {"results": {"a": {"min": 1.0}, "b": {"min": 1.0}}}
+    assert compare(baseline, {"results": {"a": {"min": 1.1}, "c": {"min": 2}}}, 1.2)
+    assert not compare(baseline, {"results": {"b": {"min": 1.5}}}, 1.2)
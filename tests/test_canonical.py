@@ -0,0 +1,98 @@
+import datetime as dt
+
+from py_opening_hours import canonical, data_structures as ds
+from py_opening_hours.evaluate import OpenHours
+
+
+def weekdays(s):
+    return canonical.canonicalize(OpenHours.from_string(s).rules)[
+        0
+    ].time_selector.weekdays.weekdays
+
+
+def times(s):
+    return canonical.canonicalize(OpenHours.from_string(s).rules)[0].time_selector.times
+
+
+def timespan(start, end):
+    return ds.TimeSpan(
+        ds.ExtendedTime.from_time(ds.Time(*start)),
+        ds.ExtendedTime.from_time(ds.Time(*end)),
+        False,
+        None,
+    )
+
+
+def test_equivalent_strings():
+    equivalent = [
+        "Mo-Fr 09:00-17:00",
+        "Mo,Tu,We,Th,Fr 09:00-17:00",
+        "Mo-We,Th-Fr 09:00-17:00",
+        "Fr,Mo-Th 09:00-12:00,12:00-17:00",
+        "Mo-Fr 09:00-17:00; Mo-Fr 09:00-17:00",
+    ]
+    assert (
+        OpenHours.from_string("Fr 22:00-02:00").fingerprint()
+        == OpenHours.from_string("Fr 22:00-26:00").fingerprint()
+    )
+    fingerprints = {OpenHours.from_string(s).fingerprint() for s in equivalent}
+    assert len(fingerprints) == 1
+    assert (
+        OpenHours.from_string("Mo-Fr 09:00-17:00; PH off").fingerprint()
+        == OpenHours.from_string("Mo-Fr 09:00-17:00; PH off; PH off").fingerprint()
+    )
+    assert (
+        OpenHours.from_string("Mo-Fr 09:00-17:00").fingerprint()
+        != OpenHours.from_string("Mo-Fr 09:00-17:00; PH off").fingerprint()
+    )
+
+
+def test_canonical_weekdays():
+    Mo, We, Fr, Sa, Su = (
+        ds.DayOfWeek.Mo,
+        ds.DayOfWeek.We,
+        ds.DayOfWeek.Fr,
+        ds.DayOfWeek.Sa,
+        ds.DayOfWeek.Su,
+    )
+    assert weekdays("Mo,We,Fr") == [
+        ds.WeekdaySpan(Mo, None, (), 0),
+        ds.WeekdaySpan(We, None, (), 0),
+        ds.WeekdaySpan(Fr, None, (), 0),
+    ]
+    assert weekdays("Sa,Su,Mo") == [ds.WeekdaySpan(Sa, Mo, (), 0)]
+    assert weekdays("Fr-Tu,We-Th") == [ds.WeekdaySpan(Mo, Su, (), 0)]
+    assert weekdays("Su[-1],Mo,Su[1],Su[-1]") == [
+        ds.WeekdaySpan(Mo, None, (), 0),
+        ds.WeekdaySpan(Su, None, (-1,), 0),
+        ds.WeekdaySpan(Su, None, (1,), 0),
+    ]
+
+
+def test_canonical_times():
+    assert times("14:00-18:00,08:00-12:00,11:00-12:30") == [
+        timespan((8, 0), (12, 30)),
+        timespan((14, 0), (18, 0)),
+    ]
+    assert times("sunrise-sunset,08:00-09:00,22:00-02:00") == [
+        timespan((8, 0), (9, 0)),
+        timespan((22, 0), (26, 0)),
+        ds.TimeSpan(
+            ds.ExtendedTime.from_variable_time(ds.VariableTime(ds.Event.sunrise)),
+            ds.ExtendedTime.from_variable_time(ds.VariableTime(ds.Event.sunset)),
+            False,
+            None,
+        ),
+    ]
+    assert times("22:00-02:00,18:00-23:00") == [timespan((18, 0), (26, 0))]
+
+
+def test_canonical_evaluation():
+    s = "Su,Sa,Mo-Fr 14:00-18:00,08:00-12:00,11:00-12:30; Fr,PH,PH off; Tu 09:00-10:00"
+    hours = OpenHours.from_string(s)
+    canonical_hours = hours.canonical()
+    assert len(canonical_hours.rules) == 3
+    start = dt.datetime(2022, 6, 27)
+    for i in range(24 * 14 * 4):
+        datetime = start + i * dt.timedelta(minutes=15)
+        assert hours.evaluate(datetime) == canonical_hours.evaluate(datetime)
@@ -0,0 +1,61 @@
+import datetime as dt
+
+import pytest
+
+from py_opening_hours import codegen
+from py_opening_hours.evaluate import OpenHours, evaluate
+from benchmarks.suite import corpus
+
+START = dt.datetime(2022, 1, 1)
+
+
+def sample_times():
+    # every 37 minutes for two years, hitting all times of day and weekdays
+    return [START + dt.timedelta(minutes=37 * i) for i in range(0, 28_000, 7)]
+
+
+def outcome(function, *args):
+    try:
+        return function(*args)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize(
+    "s",
+    corpus()
+    + [
+        "22:00-05:00; Su off",
+        "Mo 10:00; Tu 10:00+; We 10:00-12:00+",
+        "2022-2023/2 week 2-40/3 Mo-Fr 08:00-12:00 unknown",
+        "Mo-Fr 10:00-12:00 unknown; Mo-Fr 11:00-13:00; Fr[-1] off",
+        "Sa-Mo 08:00-10:00; PH -1 day closed",
+        "Fr 18:00-26:00; Sa 01:00-03:00 off; We 20:00-48:00 unknown",
+        "Sa,PH 20:00-02:00; Su 00:30-01:00 off; Mo 22:00-00:00",
+        "Fr sunset-sunrise; Mo-Fr 09:00-17:00",
+    ],
+)
+def test_compiled_matches_evaluate(s, pittsburgh_location_spec):
+    hours = OpenHours.from_string(s)
+    compiled = hours.compile()
+    for datetime in sample_times():
+        assert outcome(compiled, datetime, pittsburgh_location_spec) == outcome(
+            evaluate, hours.rules, datetime, pittsburgh_location_spec
+        )
+
+
+def test_compile_cache(monkeypatch):
+    a = OpenHours.from_string("Mo-Fr 09:00-17:00")
+    b = OpenHours.from_string("Mo,Tu,We,Th,Fr 09:00-17:00")
+    assert a.compile() is b.compile()
+
+    monkeypatch.setattr(codegen, "COMPILED", {})
+    hours = OpenHours.from_string("Sa 10:00-14:00; PH off")
+    first = hours.compile()
+    assert list(codegen.COMPILED.values()) == [first]
+    monkeypatch.setattr(codegen, "COMPILED", {})
+    second = hours.compile()
+    assert second is not first
+    assert second(dt.datetime(2022, 6, 11, 12, 0), None) == hours.evaluate(
+        dt.datetime(2022, 6, 11, 12, 0)
+    )
@@ -0,0 +1,101 @@
+import datetime as dt
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from py_opening_hours import columnar  # noqa: E402
+from py_opening_hours.evaluate import OpenHours  # noqa: E402
+
+SPECS = [
+    "Mo-Fr 10:00-20:00; PH off",
+    "Fr-Sa 18:00-06:00; PH off",
+    "Mo 10:00-12:00,12:30-15:00; Tu-Fr 08:00-12:00,12:30-15:00; Sa 08:00-12:00",
+    '"only after registration"; PH off',
+]
+
+
+def sample_datetimes():
+    start = dt.datetime(2022, 6, 30, 0, 0)
+    step = dt.timedelta(minutes=37, seconds=11)
+    return [start + i * step for i in range(400)]
+
+
+def expected_codes(specs, datetimes, loc=None):
+    return [
+        OpenHours.from_string(s).evaluate(d, loc).status.value
+        for s, d in zip(specs, datetimes)
+    ]
+
+
+def test_evaluate_array(pittsburgh_location_spec):
+    datetimes = sample_datetimes()
+    timestamps = np.array(datetimes, dtype="datetime64[us]")
+    for s in SPECS + ["sunrise-sunset; PH off"]:
+        hours = OpenHours.from_string(s)
+        result = columnar.evaluate_array(hours, timestamps, pittsburgh_location_spec)
+        assert result.tolist() == expected_codes(
+            [s] * len(datetimes), datetimes, pittsburgh_location_spec
+        )
+
+
+def test_evaluate_array_boundaries():
+    hours = OpenHours.from_string("Mo-Fr 10:00-20:00")
+    datetimes = [
+        dt.datetime(2022, 6, 6, 9, 59, 59, 999999),
+        dt.datetime(2022, 6, 6, 10, 0),
+        dt.datetime(2022, 6, 6, 20, 0),
+        dt.datetime(2022, 6, 6, 20, 0, 0, 1),
+    ]
+    timestamps = np.array(datetimes + ["NaT"], dtype="datetime64[us]")
+    result = columnar.evaluate_array(hours, timestamps)
+    assert result.tolist() == expected_codes(["Mo-Fr 10:00-20:00"] * 4, datetimes) + [
+        columnar.MISSING
+    ]
+
+
+def test_evaluate_column_pandas():
+    pd = pytest.importorskip("pandas")
+    datetimes = sample_datetimes()
+    specs = [SPECS[i % len(SPECS)] for i in range(len(datetimes))]
+    result = columnar.evaluate_column(pd.Series(specs), pd.Series(datetimes))
+    assert list(result.cat.categories) == columnar.STATUSES
+    assert result.cat.codes.tolist() == expected_codes(specs, datetimes)
+
+    result = columnar.evaluate_column(
+        pd.Series(["24/7", None]), pd.Series([datetimes[0], datetimes[1]])
+    )
+    assert result[0] == "open"
+    assert pd.isna(result[1])
+
+
+def test_evaluate_column_arrow():
+    pa = pytest.importorskip("pyarrow")
+    datetimes = sample_datetimes()
+    specs = [SPECS[i % len(SPECS)] for i in range(len(datetimes))]
+    result = columnar.evaluate_column(
+        pa.chunked_array([specs[:100], specs[100:]]),
+        pa.array(datetimes, type=pa.timestamp("ms")),
+    )
+    assert isinstance(result, pa.DictionaryArray)
+    assert result.dictionary.to_pylist() == columnar.STATUSES
+    assert result.indices.to_pylist() == expected_codes(specs, datetimes)
+
+    result = columnar.evaluate_column(
+        pa.array([None, "24/7"]), pa.array([datetimes[0], None])
+    )
+    assert result.to_pylist() == [None, None]
+
+
+def test_evaluate_column_time_zones():
+    pd = pytest.importorskip("pandas")
+    pa = pytest.importorskip("pyarrow")
+    # a monday, before opening in local time but after it in UTC
+    local = pd.Series(
+        pd.to_datetime(["2022-06-06 08:30-04:00", "2022-06-06 09:30-04:00"])
+    )
+    hours = ["Mo-Fr 09:00-17:00"] * 2
+    result = columnar.evaluate_column(pd.Series(hours), local)
+    assert result.tolist() == ["closed", "open"]
+    result = columnar.evaluate_column(pa.array(hours), pa.Array.from_pandas(local))
+    assert result.to_pylist() == ["closed", "open"]
@@ -0,0 +1,102 @@
+import datetime as dt
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import holidays
+import pytest
+
+from py_opening_hours import codegen, datetime_utils as dt_utils
+from py_opening_hours.common import StripedLock, compute_once, import_optional
+from py_opening_hours.evaluate import OpenHours
+
+THREADS = 16
+STRINGS = [
+    "Mo-Fr 08:00-18:00; PH off",
+    "Mo-Su 10:00-20:00; PH off; PH +1 day 12:00-16:00",
+    "Sa-Su sunrise-sunset; PH 10:00-14:00",
+]
+REGIONS = [("US", None), ("US", "NY"), ("DE", "BY"), ("FR", None), ("CA", "ON")]
+YEARS = range(2030, 2040)
+
+
+def test_compute_once():
+    cache = {}
+    locks = StripedLock(4)
+    calls = []
+    barrier = threading.Barrier(THREADS)
+
+    def compute():
+        calls.append(1)
+        return object()
+
+    def lookup(_):
+        barrier.wait()
+        return compute_once(cache, locks, "key", compute)
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        values = list(pool.map(lookup, range(THREADS)))
+    assert len(calls) == 1
+    assert all(value is values[0] for value in values)
+
+
+def test_concurrent_evaluation(pittsburgh_location_spec):
+    """Hammer evaluation across regions and years from many threads"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    for country, state in REGIONS:
+        dt_utils.HOLIDAYS.pop((country, state), None)
+        for year in YEARS:
+            dt_utils.HOLIDAY_DATES.pop((country, state, year), None)
+    codegen.COMPILED.clear()
+    hours = [OpenHours.from_string(s) for s in STRINGS]
+    datetimes = [
+        dt.datetime(year, month, day, hour)
+        for year in YEARS
+        for month in (1, 7, 12)
+        for day in (1, 4, 25, 26)
+        for hour in (9, 13)
+    ]
+    barrier = threading.Barrier(THREADS)
+
+    def work(worker):
+        barrier.wait()
+        results = []
+        for i, datetime in enumerate(datetimes):
+            country, state = REGIONS[(i + worker) % len(REGIONS)]
+            results.append(dt_utils.get_holiday_dates(country, state, datetime.year))
+            for h in hours:
+                results.append(h.evaluate(datetime, pittsburgh_location_spec))
+                results.append(h.compile()(datetime, pittsburgh_location_spec))
+        return results
+
+    try:
+        with ThreadPoolExecutor(THREADS) as pool:
+            results = list(pool.map(work, range(THREADS)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    # every thread sees what a single thread sees
+    dates = {
+        (country, state, year): frozenset(
+            holidays.country_holidays(country, state=state, years=year)
+        )
+        for country, state in REGIONS
+        for year in YEARS
+    }
+    for worker, result in enumerate(results):
+        expected = []
+        for i, datetime in enumerate(datetimes):
+            country, state = REGIONS[(i + worker) % len(REGIONS)]
+            expected.append(dates[(country, state, datetime.year)])
+            for h in hours:
+                modifier = h.evaluate(datetime, pittsburgh_location_spec)
+                expected += [modifier, modifier]
+        assert result == expected
+    assert len(codegen.COMPILED) == len(STRINGS)
+
+
+def test_import_optional():
+    assert import_optional("threading", "columnar") is threading
+    with pytest.raises(ImportError, match=r"py-opening-hours\[columnar\]"):
+        import_optional("not_a_dependency", "columnar")
@@ -1,3 +1,4 @@
+from py_opening_hours import datetime_utils as dt_utils, syntax
 from py_opening_hours import data_structures as ds
 import datetime as dt
 
@@ -33,6 +34,59 @@ def test_timespan_contains():
     assert interval.contains(after_close, None) is True
 
 
+def test_timespan_carries_over():
+    friday = dt.date(2022, 6, 10)
+    saturday = dt.datetime(2022, 6, 11)
+    for end in [ds.Time(2, 0), ds.Time(26, 0)]:
+        span = ds.TimeSpan(
+            ds.ExtendedTime.from_time(ds.Time(22, 0)),
+            ds.ExtendedTime.from_time(end),
+            False,
+            None,
+        )
+        assert span.spills()
+        assert span.to_intervals(friday, None) == [(dt.timedelta(hours=22), ds.ONE_DAY)]
+        assert span.to_spill(friday, None) == [
+            (ds.MIDNIGHT, dt.timedelta(hours=2, microseconds=1))
+        ]
+        assert span.contains(saturday.replace(hour=1), None) is False
+        assert span.carries_over(saturday.replace(hour=1), None) is True
+        assert span.carries_over(saturday.replace(hour=2, minute=1), None) is False
+    midnight = ds.TimeSpan(
+        ds.ExtendedTime.from_time(ds.Time(22, 0)),
+        ds.ExtendedTime.from_time(ds.Time(0, 0)),
+        False,
+        None,
+    )
+    assert not midnight.spills()
+    assert midnight.to_spill(friday, None) == []
+    assert ds.Time(25, 30).to_time() == dt.time(1, 30)
+
+    selector = syntax.parse("Fr 18:00-26:00")[0].time_selector
+    assert selector.contains(dt.datetime(2022, 6, 10, 19, 0), None)
+    assert selector.contains(dt.datetime(2022, 6, 11, 1, 0), None)
+    assert not selector.contains(dt.datetime(2022, 6, 10, 1, 0), None)
+    assert selector.spill_intervals(friday, None) == [
+        (ds.MIDNIGHT, dt.timedelta(hours=2, microseconds=1))
+    ]
+
+
+def test_timespan_spills():
+    def spills(s):
+        (span,) = syntax.parse(s)[0].time_selector.times
+        return span.spills()
+
+    assert spills("sunset-sunrise")
+    assert spills("18:00-sunset")
+    assert spills("sunset-02:00")
+    assert spills("(sunrise+02:00)-sunrise")
+    assert not spills("sunrise-sunset")
+    assert not spills("dawn-dusk")
+    assert not spills("10:00-sunset")
+    assert not spills("sunset-24:00")
+    assert not spills("(dawn+00:30)-(sunrise+00:30)")
+
+
 def test_day_of_week():
     assert ds.DayOfWeek.Mo.tomorrow() is ds.DayOfWeek.Tu
     assert ds.DayOfWeek.Su.tomorrow() is ds.DayOfWeek.Mo
@@ -65,3 +119,20 @@ def test_weekday_span():
     assert ws.contains(dt.date(2022, 6, 26)) is False
     ws = ds.WeekdaySpan(ds.DayOfWeek.Th, None, (1,), -2)
     assert ws.contains(dt.date(2022, 5, 31)) is True
+    ws = ds.WeekdaySpan(ds.DayOfWeek.Fr, None, ((2, 3),), 0)
+    assert ws.contains(dt.date(2022, 6, 3)) is False
+    assert ws.contains(dt.date(2022, 6, 10)) is True
+    assert ws.contains(dt.date(2022, 6, 17)) is True
+    assert ws.contains(dt.date(2022, 6, 24)) is False
+
+
+def test_date_context():
+    ctx = dt_utils.date_context(dt.date(2022, 7, 4))
+    assert ds.WeekdaySpan(ds.DayOfWeek.Mo, None, (1,), 0).contains(ctx) is True
+    assert ds.WeekSpan(27).contains(ctx) is True
+    assert ds.YearSpan(2020, None, True, 2).contains(ctx) is True
+    assert ds.Holiday(ds.HolidayType.public, 0).contains(ctx) is True
+    assert ds.Holiday(ds.HolidayType.public, 1).contains(ctx) is False
+    assert ds.SpecialDate.easter.contains(ctx) is False
+    selector = syntax.parse("2022 week 27 Mo[1],PH 10:00-12:00")[0].time_selector
+    assert selector.contains_date(ctx) is True
@@ -1,5 +1,6 @@
 from py_opening_hours import datetime_utils as dt_utils
 import datetime as dt
+from collections import deque
 
 
 def test_nth_weekday_of_month():
@@ -21,3 +22,44 @@ def test_weekdays_in_month():
         date.replace(day=17),
         date.replace(day=24),
     ]
+
+
+def test_date_context():
+    ctx = dt_utils.date_context(dt.date(2022, 4, 29))
+    assert ctx == dt_utils.DateContext(
+        dt.date(2022, 4, 29), 2022, 4, 17, 119, 5, -1, 12
+    )
+    assert dt_utils.date_context(dt.date(2022, 4, 29)) is ctx
+    assert dt_utils.as_context(ctx) is ctx
+    assert dt_utils.date_context(dt.date(2022, 4, 17)).easter_offset == 0
+    assert dt_utils.date_context(dt.date(2022, 12, 25)).is_holiday()
+    assert dt_utils.date_context(dt.date(2022, 12, 26)).is_holiday(1)
+
+
+def test_holiday_dates():
+    dates = dt_utils.get_holiday_dates("US", None, 2022)
+    assert dt.date(2022, 7, 4) in dates
+    assert all(date.year == 2022 for date in dates)
+
+
+def test_holidays_copy():
+    calendar = dt_utils.get_holidays("US", None)
+    calendar[dt.date(2022, 7, 5)] = "Extra"
+    calendar.get(dt.date(2091, 1, 1))
+    assert dt.date(2022, 7, 5) not in dt_utils.get_holiday_dates("US", None, 2022)
+    assert dt.date(2091, 1, 1) in dt_utils.get_holiday_dates("US", None, 2091)
+
+
+def test_sun_cache_bounded(pittsburgh_location_spec, monkeypatch):
+    monkeypatch.setattr(dt_utils, "SUN", {})
+    monkeypatch.setattr(dt_utils, "SUN_KEYS", deque())
+    monkeypatch.setattr(dt_utils, "SUN_TABLES", {})
+    monkeypatch.setattr(dt_utils, "SUN_CACHED", 5)
+    dates = [dt.date(2022, 6, 1) + dt.timedelta(days=i) for i in range(20)]
+    times = [
+        dt_utils.get_sun_time(pittsburgh_location_spec, d, "sunset") for d in dates
+    ]
+    assert len(dt_utils.SUN) == 5
+    assert [
+        dt_utils.get_sun_time(pittsburgh_location_spec, d, "sunset") for d in dates
+    ] == times
@@ -1,6 +1,12 @@
 import datetime as dt
+import importlib
+import pickle
+import threading
+import time
 
-from py_opening_hours.evaluate import OpenHours
+from py_opening_hours import syntax
+from py_opening_hours.analysis import FastPath
+from py_opening_hours.evaluate import Bucket, OpenHours, diff
 from py_opening_hours.data_structures import RuleStatus
 
 
@@ -134,3 +140,266 @@ def test_readme_example():
     hours = OpenHours.from_string(s)
     monday_at_11_am = dt.datetime(2022, 6, 6, 11, 0)
     assert hours.evaluate(monday_at_11_am).status is RuleStatus.open
+
+
+def test_intervals():
+    hours = OpenHours.from_string("22:00-02:00")
+    start = dt.datetime(2022, 6, 10, 20, 0)
+    intervals = list(hours.intervals(start, start + dt.timedelta(days=1)))
+    assert [(i.start, i.end, i.modifier.status) for i in intervals] == [
+        (start, dt.datetime(2022, 6, 10, 22, 0), RuleStatus.closed),
+        (
+            dt.datetime(2022, 6, 10, 22, 0),
+            dt.datetime(2022, 6, 11, 2, 0, 0, 1),
+            RuleStatus.open,
+        ),
+        (
+            dt.datetime(2022, 6, 11, 2, 0, 0, 1),
+            start + dt.timedelta(days=1),
+            RuleStatus.closed,
+        ),
+    ]
+
+
+def test_carry_over():
+    hours = OpenHours.from_string("Fr 22:00-02:00; Sa 10:00-12:00")
+    friday = dt.datetime(2022, 6, 10)
+    assert hours.evaluate(friday.replace(hour=1)).status is RuleStatus.closed
+    assert hours.evaluate(friday.replace(hour=23)).status is RuleStatus.open
+    saturday = friday + dt.timedelta(days=1)
+    assert hours.evaluate(saturday.replace(hour=1)).status is RuleStatus.open
+    assert hours.evaluate(saturday.replace(hour=3)).status is RuleStatus.closed
+    assert [
+        (i.start, i.end)
+        for i in hours.intervals(friday, friday + dt.timedelta(days=2))
+        if i.modifier.status is RuleStatus.open
+    ] == [
+        (friday.replace(hour=22), saturday.replace(hour=2, microsecond=1)),
+        (saturday.replace(hour=10), saturday.replace(hour=12, microsecond=1)),
+    ]
+    extended = OpenHours.from_string("Fr 22:00-26:00; Sa 01:00-01:30 off")
+    assert extended.evaluate(saturday.replace(hour=0, minute=30)).status is (
+        RuleStatus.open
+    )
+    assert extended.evaluate(saturday.replace(hour=1, minute=15)).status is (
+        RuleStatus.closed
+    )
+
+
+def test_lazy(monkeypatch):
+    ev = importlib.import_module("py_opening_hours.evaluate")
+    parsed = []
+
+    def slow_parse(s):
+        parsed.append(s)
+        time.sleep(0.01)
+        return syntax.parse(s)
+
+    s = "Mo-Fr 09:00-17:00; PH off"
+    hours = OpenHours.lazy(s)
+    monkeypatch.setattr(ev, "parse", slow_parse)
+    assert not hours.parsed
+    assert hours.source == s
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(hours.evaluate(dt.datetime(2022, 6, 6, 10)))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert parsed == [s]
+    assert hours.parsed
+    assert {r.status for r in results} == {RuleStatus.open}
+
+    assert OpenHours.lazy("Mo 25:00", valid=False).is_valid() is False
+    assert OpenHours.lazy("Mo 10:00-12:00").is_valid() is True
+    assert OpenHours.lazy("Mo 10:00 nonsense").is_valid() is False
+    assert OpenHours([]).is_valid() is None
+    lazy = pickle.loads(pickle.dumps(OpenHours.lazy(s)))
+    assert not lazy.parsed
+    assert lazy.rules == hours.rules
+
+    lazy = OpenHours.lazy(s)
+    lazy.rules = syntax.parse("Mo-Fr 10:00-12:00")
+    assert lazy.parsed and lazy.source is None and lazy.is_valid() is None
+    assert lazy.evaluate(dt.datetime(2022, 6, 6, 9)).status is RuleStatus.closed
+    lazy.name = "Library"
+    assert lazy.name == "Library"
+
+
+def test_next_change():
+    hours = OpenHours.from_string("Mo-Fr 09:00-17:00")
+    change = hours.next_change(dt.datetime(2022, 6, 10, 12, 0))
+    assert change.start == dt.datetime(2022, 6, 10, 17, 0, 0, 1)
+    assert change.modifier.status is RuleStatus.closed
+    assert hours.next_change(dt.datetime(2022, 6, 10, 18, 0)).start == dt.datetime(
+        2022, 6, 13, 9, 0
+    )
+    assert OpenHours.from_string("24/7").next_change(dt.datetime(2022, 6, 10)) is None
+
+
+def test_next_change_weekly():
+    ev = importlib.import_module("py_opening_hours.evaluate")
+    datetimes = [
+        dt.datetime(2022, 6, 10, 12) + dt.timedelta(hours=7 * i) for i in range(30)
+    ]
+    for s in [
+        "Mo 10:00-12:00",
+        "Fr 22:00-26:00; Sa off",
+        "Mo-Su 00:00-24:00; Tu 13:00-13:01",
+    ]:
+        hours = OpenHours.from_string(s)
+        assert hours.analyze().fast_path is FastPath.weekly
+        for datetime in datetimes:
+            # the whole horizon, without the weekly shortcut
+            expected = ev.first_change(
+                ev.segments_of(hours.rules, None), datetime, ev.HORIZON
+            )
+            assert hours.next_change(datetime) == expected
+
+
+def open_total(hours, start, end, loc=None):
+    ev = importlib.import_module("py_opening_hours.evaluate")
+    intervals = ev.walk(ev.segments_of(hours.rules, loc, closed=False), start, end)
+    return sum(
+        (i.end - i.start for i in intervals if i.modifier.status is RuleStatus.open),
+        dt.timedelta(0),
+    )
+
+
+def test_open_duration(pittsburgh_location_spec):
+    loc = pittsburgh_location_spec
+    start = dt.datetime(2022, 1, 3, 13, 30)
+    end = dt.datetime(2022, 4, 20, 11, 15)
+    for s in [
+        "Mo-Fr 09:00-17:00; Sa 10:00-12:00",
+        "22:00-02:00",
+        "Mo-Fr 08:00-20:00; PH off; week 10-13 Mo-Fr 08:00-12:00",
+        "Mo-Su sunrise-sunset; We off",
+        "Mo-Fr 09:00-17:00; PH 20:00-26:00; week 10 Fr 22:00-03:00",
+        "Mo-Fr 09:00-17:00; PH off; PH +1 day 10:00-12:00",
+        "Sa,PH 10:00-14:00; Fr 22:00-02:00; PH 23:00-01:00",
+    ]:
+        hours = OpenHours.from_string(s)
+        assert hours.open_duration(start, end, loc) == open_total(
+            hours, start, end, loc
+        )
+    hours = OpenHours.from_string("Mo-Fr 09:00-17:00")
+    assert hours.open_duration(end, start) == dt.timedelta(0)
+    week = dt.datetime(2022, 1, 3)
+    assert hours.open_duration(week, week + dt.timedelta(days=7)) == 5 * (
+        dt.timedelta(hours=8)
+    )
+    year = dt.datetime(2022, 1, 1), dt.datetime(2023, 1, 1)
+    hours = OpenHours.from_string("Mo-Fr 09:00-17:00; PH off")
+    # 260 weekdays, of which 10 are holidays (new year's day is a saturday)
+    assert hours.open_duration(*year) == 250 * dt.timedelta(hours=8)
+
+
+def test_open_durations():
+    hours = OpenHours.from_string("Mo-Fr 09:00-17:00")
+    start = dt.datetime(2022, 1, 15)
+    end = dt.datetime(2022, 3, 2, 12, 0)
+    months = hours.open_durations(start, end, Bucket.month)
+    assert [m for m, _ in months] == [
+        dt.datetime(2022, 1, 1),
+        dt.datetime(2022, 2, 1),
+        dt.datetime(2022, 3, 1),
+    ]
+    assert months[0][1] == open_total(hours, start, dt.datetime(2022, 2, 1))
+    assert sum((d for _, d in months), dt.timedelta(0)) == hours.open_duration(
+        start, end
+    )
+    weeks = hours.open_durations(start, end, Bucket.week)
+    assert weeks[0] == (dt.datetime(2022, 1, 10), dt.timedelta(0))
+    days = hours.open_durations(start, end, Bucket.day)
+    assert len(days) == 47
+
+
+def test_is_open_throughout():
+    hours = OpenHours.from_string("Mo-Fr 09:00-17:00; Fr 22:00-05:00")
+    assert hours.is_open_throughout(
+        dt.datetime(2022, 6, 8, 14, 30), dt.datetime(2022, 6, 8, 15, 15)
+    )
+    assert hours.is_open_throughout(
+        dt.datetime(2022, 6, 8, 16, 0), dt.datetime(2022, 6, 8, 17, 0)
+    )
+    assert not hours.is_open_throughout(
+        dt.datetime(2022, 6, 8, 16, 0), dt.datetime(2022, 6, 8, 17, 1)
+    )
+    assert not hours.is_open_throughout(
+        dt.datetime(2022, 6, 8, 8, 0), dt.datetime(2022, 6, 8, 8, 0)
+    )
+    night = OpenHours.from_string("22:00-05:00")
+    assert night.is_open_throughout(
+        dt.datetime(2022, 6, 8, 23, 0), dt.datetime(2022, 6, 9, 4, 0)
+    )
+
+
+def test_is_open_during():
+    hours = OpenHours.from_string("Mo-Fr 09:00-17:00")
+    assert hours.is_open_during(
+        dt.datetime(2022, 6, 8, 7, 0), dt.datetime(2022, 6, 8, 10, 0)
+    )
+    assert not hours.is_open_during(
+        dt.datetime(2022, 6, 10, 18, 0), dt.datetime(2022, 6, 13, 9, 0)
+    )
+    assert hours.is_open_during(
+        dt.datetime(2022, 6, 10, 18, 0), dt.datetime(2022, 6, 13, 9, 1)
+    )
+    assert hours.is_open_during(
+        dt.datetime(2022, 6, 8, 17, 0), dt.datetime(2022, 6, 8, 17, 0)
+    )
+
+
+def test_diff():
+    old = OpenHours.from_string("Mo-Fr 09:00-17:00")
+    new = OpenHours.from_string("Mo-Fr 09:00-18:00; We off")
+    start = dt.datetime(2022, 6, 6)
+    end = dt.datetime(2022, 6, 13)
+    changes = list(diff(old, new, start, end))
+    assert [(c.start, c.end, c.old.status, c.new.status) for c in changes] == [
+        (
+            dt.datetime(2022, 6, 6, 17, 0, 0, 1),
+            dt.datetime(2022, 6, 6, 18, 0, 0, 1),
+            RuleStatus.closed,
+            RuleStatus.open,
+        ),
+        (
+            dt.datetime(2022, 6, 7, 17, 0, 0, 1),
+            dt.datetime(2022, 6, 7, 18, 0, 0, 1),
+            RuleStatus.closed,
+            RuleStatus.open,
+        ),
+        (
+            dt.datetime(2022, 6, 8, 9, 0),
+            dt.datetime(2022, 6, 8, 17, 0, 0, 1),
+            RuleStatus.open,
+            RuleStatus.closed,
+        ),
+        (
+            dt.datetime(2022, 6, 9, 17, 0, 0, 1),
+            dt.datetime(2022, 6, 9, 18, 0, 0, 1),
+            RuleStatus.closed,
+            RuleStatus.open,
+        ),
+        (
+            dt.datetime(2022, 6, 10, 17, 0, 0, 1),
+            dt.datetime(2022, 6, 10, 18, 0, 0, 1),
+            RuleStatus.closed,
+            RuleStatus.open,
+        ),
+    ]
+    # the modifiers are those evaluated at both ends of the changes
+    for change in changes:
+        for datetime in (change.start, change.end - dt.timedelta(microseconds=1)):
+            assert old.evaluate(datetime) == change.old
+            assert new.evaluate(datetime) == change.new
+    same = OpenHours.from_string("Mo,Tu,We,Th,Fr 09:00-17:00")
+    assert list(diff(old, same, start, end)) == []
+    comment = OpenHours.from_string('Mo-Fr 09:00-17:00 "by appointment"')
+    assert len(list(diff(old, comment, start, end))) == 5
@@ -0,0 +1,74 @@
+import datetime as dt
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from py_opening_hours.index import OpenIndex  # noqa: E402
+from py_opening_hours.evaluate import OpenHours  # noqa: E402
+from py_opening_hours.data_structures import RuleStatus  # noqa: E402
+
+SPECS = {
+    "office": "Mo-Fr 09:00-17:00",
+    "office2": "Mo,Tu,We,Th,Fr 09:00-17:00",
+    "shop": "Mo-Sa 10:00-20:00; PH off",
+    "bar": "Fr-Sa 18:00-23:30; PH off",
+    "market": "week 2-52/2 We 07:00-13:00",
+    "park": "sunrise-sunset",
+    "always": "24/7",
+    "never": "24/7 closed",
+}
+
+
+HOURS = {place: OpenHours.from_string(s) for place, s in SPECS.items()}
+
+
+@pytest.fixture
+def index(pittsburgh_location_spec):
+    locations = {"park": pittsburgh_location_spec}
+    return OpenIndex.build(
+        HOURS, dt.date(2022, 6, 1), dt.date(2022, 7, 31), locations=locations
+    )
+
+
+def expected_open(datetime, loc):
+    return [
+        place
+        for place, hours in HOURS.items()
+        if hours.evaluate(datetime, loc if place == "park" else None).status
+        is RuleStatus.open
+    ]
+
+
+def test_groups(index):
+    # the two offices share a group
+    assert len(index.groups) == len(SPECS) - 1
+
+
+def test_open_at(index, pittsburgh_location_spec):
+    # inside the horizon (including independence day) and outside of it
+    for start in (dt.datetime(2022, 6, 27), dt.datetime(2022, 12, 26)):
+        for i in range(7 * 24 * 4):
+            datetime = start + i * dt.timedelta(minutes=15)
+            assert index.open_at(datetime) == expected_open(
+                datetime, pittsburgh_location_spec
+            ), datetime
+    assert "shop" not in index.open_at(dt.datetime(2022, 7, 4, 12, 0))
+    assert "shop" in index.open_at(dt.datetime(2022, 7, 5, 12, 7))
+
+
+def test_open_between(index):
+    start = dt.datetime(2022, 6, 6, 8, 0)
+    assert index.open_between(start, start + dt.timedelta(hours=1)) == [
+        "office",
+        "office2",
+        "park",
+        "always",
+    ]
+    assert index.open_between(start, start + dt.timedelta(hours=2)) == [
+        "office",
+        "office2",
+        "shop",
+        "park",
+        "always",
+    ]
@@ -0,0 +1,43 @@
+import datetime as dt
+
+from py_opening_hours import instrumentation
+from py_opening_hours import data_structures as ds
+from py_opening_hours import datetime_utils as dt_utils
+from py_opening_hours.evaluate import OpenHours
+
+
+def test_instrumentation(pittsburgh_location_spec):
+    original = ds.Rule.contains
+    calls = []
+
+    def listener(phase, seconds):
+        calls.append(phase)
+
+    instrumentation.reset()
+    instrumentation.add_listener(listener)
+    dt_utils.HOLIDAY_DATES.pop(("US", None, 2022), None)
+    with instrumentation.enabled():
+        assert instrumentation.is_enabled()
+        assert ds.Rule.contains is not original
+        hours = OpenHours.from_string("Mo-Fr sunrise-sunset; PH off")
+        hours.evaluate(dt.datetime(2022, 6, 6, 10, 10), pittsburgh_location_spec)
+        hours.evaluate(dt.datetime(2022, 6, 7, 10, 10), pittsburgh_location_spec)
+    instrumentation.remove_listener(listener)
+    assert not instrumentation.is_enabled()
+    assert ds.Rule.contains is original
+
+    stats = instrumentation.snapshot()
+    assert stats.phases["parse"].calls == 1
+    assert stats.phases["evaluate"].calls == 2
+    assert stats.phases["Rule.contains"].calls == 4
+    assert stats.phases["Holiday.contains"].calls == 2
+    assert stats.phases["Event.to_datetime"].calls == 4
+    assert stats.phases["evaluate"].seconds >= stats.phases["Rule.contains"].seconds
+    assert stats.caches["holidays"] == instrumentation.CacheStats(1, 1)
+    assert calls.count("TimeSpan.contains") == 2
+
+    # nothing is recorded while disabled
+    hours.evaluate(dt.datetime(2022, 6, 6, 10, 10), pittsburgh_location_spec)
+    assert instrumentation.snapshot() == stats
+    instrumentation.reset()
+    assert instrumentation.snapshot() == instrumentation.Snapshot({}, {})
@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from py_opening_hours import columnar, parallel  # noqa: E402
+from py_opening_hours.evaluate import OpenHours  # noqa: E402
+
+
+def sample_timestamps(n):
+    start = np.datetime64("2022-06-30T00:00", "us")
+    step = np.timedelta64(37 * 60 + 11, "s")
+    return start + np.arange(n) * step
+
+
+def test_evaluate_shared(pittsburgh_location_spec):
+    timestamps = sample_timestamps(1000)
+    timestamps[7] = np.datetime64("NaT")
+    for s in ["Mo-Fr 10:00-20:00; PH off", "Mo-Su sunrise-sunset"]:
+        hours = OpenHours.from_string(s)
+        expected = columnar.evaluate_array(hours, timestamps, pittsburgh_location_spec)
+        with parallel.evaluate_shared(
+            s, timestamps, pittsburgh_location_spec, processes=2, chunk_size=150
+        ) as result:
+            assert result.array.dtype == np.int8
+            assert result.array.tolist() == expected.tolist()
+            assert result.array[7] == columnar.MISSING
+
+
+def test_shared_inputs():
+    hours = OpenHours.from_string("Mo-Fr 09:00-17:00")
+    with parallel.SharedArray.create((300,), "datetime64[us]") as inputs:
+        inputs.array[:] = sample_timestamps(300)
+        with parallel.evaluate_shared(hours, inputs, chunk_size=100) as result:
+            assert result.array.tolist() == [
+                hours.evaluate(d).status.value for d in inputs.array.tolist()
+            ]
+
+
+def test_empty(monkeypatch):
+    with parallel.evaluate_shared("24/7", np.array([], dtype="datetime64[us]")) as r:
+        assert r.array.shape == (0,)
+    # nothing is placed in shared memory before the input is rejected
+    monkeypatch.setattr(parallel.SharedArray, "create", None)
+    with pytest.raises(ValueError):
+        parallel.evaluate_shared("24/7", sample_timestamps(4).reshape(2, 2))
+
+
+def test_attach():
+    with parallel.SharedArray.copy(np.arange(5)) as shared:
+        other = parallel.SharedArray.attach(shared.spec)
+        other.array[0] = 42
+        assert shared.array[0] == 42
+        other.close()
+
+
+def test_detach():
+    hours = OpenHours.from_string("24/7")
+    with parallel.SharedArray.copy(sample_timestamps(3)) as inputs:
+        with parallel.SharedArray.create((3,), np.int8) as outputs:
+            parallel.attach(hours, None, inputs.spec, outputs.spec)
+            attached = parallel.WORKER["inputs"], parallel.WORKER["outputs"]
+            parallel.detach()
+            assert all(shared.array is None for shared in attached)
+            assert "inputs" not in parallel.WORKER
+            parallel.detach()
@@ -0,0 +1,80 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from py_opening_hours import parse_cache, settings, syntax
+from py_opening_hours.evaluate import OpenHours
+
+STRINGS = [
+    "Mo-Fr 08:00-12:00,13:00-17:30; Sa 08:00-12:00; PH off",
+    "Fr 22:00-26:00; sunrise-sunset unknown",
+    '"by appointment"',
+]
+
+
+def cached_rules(path):
+    cache = parse_cache.ParseCache(path)
+    return [cache.get(s) for s in STRINGS]
+
+
+def test_parse_cache(tmp_path):
+    path = tmp_path / "rules.sqlite"
+    cache = parse_cache.ParseCache(path)
+    assert cache.get(STRINGS[0]) is None
+    assert cache.parse(STRINGS[0]) == list(syntax.parse(STRINGS[0]))
+    assert len(cache) == 1
+    assert cache.parse_many(STRINGS + STRINGS[:1]) == [
+        list(syntax.parse(s)) for s in STRINGS + STRINGS[:1]
+    ]
+    assert len(cache) == len(STRINGS)
+    cache.close()
+
+    reopened = parse_cache.ParseCache(path)
+    assert reopened.get(STRINGS[1]) == list(syntax.parse(STRINGS[1]))
+    with ProcessPoolExecutor(2) as executor:
+        for rules in executor.map(cached_rules, [path] * 4):
+            assert rules == [list(syntax.parse(s)) for s in STRINGS]
+    reopened.clear()
+    assert len(reopened) == 0
+
+
+def test_grammar_change(tmp_path, monkeypatch):
+    path = tmp_path / "rules.sqlite"
+    cache = parse_cache.ParseCache(path)
+    cache.parse_many(STRINGS)
+    monkeypatch.setattr(parse_cache, "grammar_version", lambda: "changed")
+    changed = parse_cache.ParseCache(path)
+    assert len(changed) == 0
+    assert changed.get(STRINGS[0]) is None
+    # other versions sharing the database keep their entries until purged
+    assert cache.get(STRINGS[0]) == list(syntax.parse(STRINGS[0]))
+    changed.parse(STRINGS[0])
+    changed.purge()
+    assert len(changed) == 1
+    assert cache.get(STRINGS[0]) is None
+
+
+def test_encode(opening_hours_example):
+    rules = list(syntax.parse(opening_hours_example))
+    encoded = json.dumps(parse_cache.encode(rules))
+    assert parse_cache.decode(json.loads(encoded)) == rules
+
+
+def test_untrusted(tmp_path):
+    path = tmp_path / "rules.sqlite"
+    cache = parse_cache.ParseCache(path)
+    row = (parse_cache.string_key(STRINGS[0]), cache.version, '["os", "system"]')
+    with cache.connection() as db:
+        db.execute("INSERT INTO rules VALUES (?, ?, ?)", row)
+    assert cache.get(STRINGS[0]) is None
+    assert cache.parse(STRINGS[0]) == list(syntax.parse(STRINGS[0]))
+
+
+def test_from_string(tmp_path, monkeypatch):
+    path = str(tmp_path / "rules.sqlite")
+    monkeypatch.setattr(settings, "PARSE_CACHE_PATH", path)
+    monkeypatch.setattr(parse_cache, "CACHES", {})
+    hours = OpenHours.from_string(STRINGS[0])
+    assert len(parse_cache.get_cache(path)) == 1
+    assert OpenHours.from_string(STRINGS[0]).rules == hours.rules
+    monkeypatch.setattr(syntax, "parse", None)
+    assert OpenHours.from_string(STRINGS[0]).rules == hours.rules
@@ -0,0 +1,73 @@
+import datetime as dt
+
+from py_opening_hours.data_structures import Comment, RuleStatus
+from py_opening_hours.evaluate import OpenHours
+from py_opening_hours.scheduler import StatusChange, StatusScheduler
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_scheduler():
+    clock = Clock(dt.datetime(2022, 6, 6, 8, 0))
+    scheduler = StatusScheduler(clock)
+    assert (
+        scheduler.add("office", OpenHours.from_string("Mo-Fr 09:00-17:00")).status
+        is RuleStatus.closed
+    )
+    scheduler.add(
+        "cafe",
+        OpenHours.from_string(
+            'Mo-Fr 08:00-10:00 "breakfast"; Mo-Fr 10:00-12:00 "brunch"'
+        ),
+    )
+    scheduler.add("always", OpenHours.from_string("24/7"))
+    assert len(scheduler) == 3
+    assert scheduler.status("cafe").comment == Comment("breakfast")
+    assert scheduler.next_time() == dt.datetime(2022, 6, 6, 9, 0)
+    assert scheduler.poll() == []
+
+    clock.now = dt.datetime(2022, 6, 6, 9, 30)
+    assert scheduler.poll() == [
+        StatusChange("office", dt.datetime(2022, 6, 6, 9, 0), RuleStatus.open, None)
+    ]
+    assert scheduler.status("office").status is RuleStatus.open
+
+    clock.now = dt.datetime(2022, 6, 6, 18, 0)
+    assert scheduler.poll() == [
+        StatusChange(
+            "cafe",
+            dt.datetime(2022, 6, 6, 10, 0, 0, 1),
+            RuleStatus.open,
+            Comment("brunch"),
+        ),
+        StatusChange(
+            "cafe", dt.datetime(2022, 6, 6, 12, 0, 0, 1), RuleStatus.closed, None
+        ),
+        StatusChange(
+            "office", dt.datetime(2022, 6, 6, 17, 0, 0, 1), RuleStatus.closed, None
+        ),
+    ]
+
+    scheduler.remove("cafe")
+    clock.now = dt.datetime(2022, 6, 7, 12, 0)
+    changes = scheduler.poll()
+    assert [(c.id, c.status) for c in changes] == [("office", RuleStatus.open)]
+    assert "cafe" not in scheduler
+
+
+def test_scheduler_horizon():
+    clock = Clock(dt.datetime(2022, 6, 6, 8, 0))
+    scheduler = StatusScheduler(clock, horizon=dt.timedelta(days=2))
+    scheduler.add("weekend", OpenHours.from_string("Sa-Su 10:00-12:00"))
+    # no change within the horizon, so check again at its end
+    assert scheduler.next_time() == dt.datetime(2022, 6, 8, 8, 0)
+    clock.now = dt.datetime(2022, 6, 11, 11, 0)
+    assert scheduler.poll() == [
+        StatusChange("weekend", dt.datetime(2022, 6, 11, 10, 0), RuleStatus.open, None)
+    ]
@@ -0,0 +1,85 @@
+import datetime as dt
+
+import pytest
+from astral import LocationInfo
+from astral import sun
+
+np = pytest.importorskip("numpy")
+
+from py_opening_hours import solar  # noqa: E402
+from py_opening_hours import data_structures as ds  # noqa: E402
+from py_opening_hours import datetime_utils as dt_utils  # noqa: E402
+from py_opening_hours import settings  # noqa: E402
+
+LOCATIONS = [
+    LocationInfo("Tromso", "Norway", "Europe/Oslo", 69.65, 18.96),
+    LocationInfo("Sydney", "Australia", "Australia/Sydney", -33.87, 151.21),
+    LocationInfo("Honolulu", "USA", "Pacific/Honolulu", 21.31, -157.86),
+    LocationInfo("Quito", "Ecuador", "America/Guayaquil", -0.18, -78.47),
+]
+
+
+def test_sun_times_match_astral(pittsburgh_location_spec):
+    locations = LOCATIONS + [pittsburgh_location_spec]
+    dates = solar.year_dates(2022)
+    times = solar.sun_times(dates, [loc.observer for loc in locations])
+    for event in solar.EVENTS:
+        assert times[event].shape == (len(dates), len(locations))
+        for j, loc in enumerate(locations):
+            for i, date in enumerate(dates.tolist()):
+                value = times[event][i, j]
+                try:
+                    expected = getattr(sun, event)(loc.observer, date)
+                except ValueError:
+                    assert np.isnat(value)
+                    continue
+                actual = solar.UTC_EPOCH + dt.timedelta(
+                    microseconds=int(value.astype(np.int64))
+                )
+                assert abs(actual - expected) < dt.timedelta(seconds=1)
+
+
+def test_precompute(pittsburgh_location_spec):
+    loc = pittsburgh_location_spec
+    dt_utils.SUN_TABLES.clear()
+    solar.precompute([loc, loc], dt.date(2021, 12, 1), dt.date(2022, 1, 31))
+    key = dt_utils.sun_key(loc)
+    assert set(dt_utils.SUN_TABLES) == {(key, 2021), (key, 2022)}
+    date = dt.date(2022, 6, 6)
+    sunrise = ds.Event.sunrise.to_datetime(date, loc)
+    expected = sun.sunrise(loc.observer, date, tzinfo=loc.timezone)
+    assert sunrise.utcoffset() == expected.utcoffset()
+    assert abs(sunrise - expected) < dt.timedelta(seconds=1)
+
+
+def test_missing_events():
+    tromso = LOCATIONS[0]
+    solar.precompute([tromso], dt.date(2022, 6, 21), dt.date(2022, 6, 21))
+    with pytest.raises(ValueError):
+        ds.Event.sunrise.to_datetime(dt.date(2022, 6, 21), tromso)
+    assert ds.Event.sunrise.to_datetime(dt.date(2022, 3, 21), tromso)
+
+
+def test_sun_grid(pittsburgh_location_spec, monkeypatch):
+    monkeypatch.setattr(settings, "SUN_GRID", 0.1)
+    pittsburgh = pittsburgh_location_spec
+    downtown = LocationInfo("Downtown", "PA", "America/New_York", 40.441, -80.002)
+    elsewhere = LocationInfo("Elsewhere", "PA", "America/New_York", 40.52, -80.002)
+    assert dt_utils.sun_key(pittsburgh) == dt_utils.sun_key(downtown)
+    assert dt_utils.sun_key(pittsburgh) != dt_utils.sun_key(elsewhere)
+
+    dt_utils.SUN_TABLES.clear()
+    solar.precompute(
+        [pittsburgh, downtown, elsewhere], dt.date(2022, 1, 1), dt.date(2022, 1, 1)
+    )
+    assert len(dt_utils.SUN_TABLES) == 2
+
+    bound = solar.max_error_minutes(pittsburgh.latitude)
+    assert 0 < bound < 1
+    assert bound <= solar.grid_error_minutes(max_latitude=45)
+    date = dt.date(2022, 6, 6)
+    for event in solar.EVENTS:
+        actual = dt_utils.get_sun_time(pittsburgh, date, event)
+        expected = getattr(sun, event)(pittsburgh.observer, date)
+        assert abs(actual - expected) <= dt.timedelta(minutes=bound)
+    dt_utils.SUN_TABLES.clear()
@@ -1,5 +1,7 @@
+import random
+
 import pytest
-from py_opening_hours import syntax, data_structures as ds
+from py_opening_hours import syntax, settings, data_structures as ds
 from pyparsing.exceptions import ParseException
 
 
@@ -377,3 +379,64 @@ def test_relative_times():
 def test_example(opening_hours_example):
     rules = syntax.parse(opening_hours_example)
     assert rules
+
+
+def test_split_rules():
+    assert syntax.split_rules('Mo-Fr 10:00-20:00; PH off || "a; b||c" unknown') == [
+        "Mo-Fr 10:00-20:00",
+        " PH off ",
+        ' "a; b||c" unknown',
+    ]
+    assert syntax.split_rules("Mo-Fr;") == ["Mo-Fr", ""]
+
+
+def test_segment_cache(opening_hours_example, monkeypatch):
+    expected = list(syntax.parse(opening_hours_example))
+    monkeypatch.setattr(settings, "CACHE_RULE_SEGMENTS", True)
+    assert list(syntax.parse(opening_hours_example)) == expected
+    # a second time from the cache
+    assert list(syntax.parse(opening_hours_example)) == expected
+
+
+def test_segment_cache_fallback(monkeypatch):
+    strings = ["PH Off; Mo 10:00-12:00", "Mo-Fr;", "", "foo", "Sa 10:00-14:00 || Su"]
+    expected = [list(syntax.parse(s)) for s in strings]
+    monkeypatch.setattr(settings, "CACHE_RULE_SEGMENTS", True)
+    syntax.parse_segment.cache_clear()
+    assert [list(syntax.parse(s)) for s in strings] == expected
+    syntax.parse("Mo 08:00-12:00; PH off")
+    syntax.parse("Tu 08:00-12:00; PH off")
+    assert syntax.parse_segment.cache_info().hits >= 1
+
+
+def test_try_parse():
+    rules = syntax.try_parse("Mo-Fr 10:00-20:00; PH off")
+    assert rules == list(syntax.parse("Mo-Fr 10:00-20:00; PH off"))
+    assert syntax.try_parse("Mo-Fr 10:00-20:00; PH Off") == syntax.ParseError(
+        22, "Unexpected word 'Off'"
+    )
+    assert syntax.try_parse('Mo "closed') == syntax.ParseError(
+        3, "Unterminated comment"
+    )
+    assert syntax.try_parse("sunrise-(sunset-01:00") == syntax.ParseError(
+        8, "Unbalanced '('"
+    )
+    assert syntax.try_parse("Mo 9:00-17:00").position == 3
+    assert syntax.is_valid('week 1-53/2 Mo,We[1] 10:00-12:00 closed "note"')
+    assert not syntax.is_valid("lundi 09:00-12:00")
+
+
+def test_prescan_never_rejects_valid():
+    pieces = [
+        *("Mo", "-", "Fr", " ", "10:00", "18:00", ";", "PH", " off", "||", ","),
+        *("Sa", '"x"', ":", "sunrise", "(", "sunset", "01:00", ")", "[", "1", "]"),
+        *("week", "Week", "2022", "Jan", "01", "+", "/", "days", "24/7", "|", "é"),
+    ]
+    rng = random.Random(0)
+    for _ in range(2000):
+        s = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 8)))
+        try:
+            syntax.time_domain.parse_string(s, parse_all=True)
+        except ParseException:
+            continue
+        assert syntax.prescan(s) is None, s
@@ -0,0 +1,51 @@
+import datetime as dt
+
+import pytest
+
+from py_opening_hours.data_structures import RuleStatus
+from py_opening_hours.evaluate import OpenHours
+from py_opening_hours.timeline import Run, Timeline
+
+
+def test_materialize():
+    hours = OpenHours.from_string("Mo-Fr 09:00-17:00; PH off")
+    timeline = hours.materialize(2022)
+    # 260 weekdays, 10 of which are holidays
+    assert len(timeline) == 2 * (260 - 10) + 1
+    assert timeline.status_at(dt.datetime(2022, 6, 6, 9, 0)) is RuleStatus.open
+    assert timeline.status_at(dt.datetime(2022, 6, 6, 17, 0, 30)) is RuleStatus.open
+    assert timeline.status_at(dt.datetime(2022, 6, 6, 17, 1)) is RuleStatus.closed
+    assert timeline.status_at(dt.datetime(2022, 7, 4, 12, 0)) is RuleStatus.closed
+    assert timeline.next_change(dt.datetime(2022, 6, 6, 12, 0)) == dt.datetime(
+        2022, 6, 6, 17, 1
+    )
+    assert timeline.next_change(dt.datetime(2022, 12, 31, 12, 0)) is None
+    runs = list(timeline.runs())
+    assert runs[0] == Run(
+        dt.datetime(2022, 1, 1), dt.datetime(2022, 1, 3, 9, 0), RuleStatus.closed
+    )
+    assert runs[-1].end == dt.datetime(2023, 1, 1)
+    with pytest.raises(ValueError):
+        timeline.status_at(dt.datetime(2023, 1, 1))
+
+
+def test_matches_evaluate(pittsburgh_location_spec):
+    hours = OpenHours.from_string("Mo-Sa sunrise-sunset; Su 22:00-02:00 unknown")
+    resolution = dt.timedelta(minutes=15)
+    timeline = hours.materialize(2022, pittsburgh_location_spec, resolution)
+    datetime = dt.datetime(2022, 1, 1)
+    while datetime.year == 2022:
+        expected = hours.evaluate(datetime, pittsburgh_location_spec).status
+        assert timeline.status_at(datetime) is expected
+        datetime += resolution * 7
+
+
+def test_bytes():
+    hours = OpenHours.from_string("Mo-Fr 08:00-12:00,13:00-17:30; Sa 08:00-12:00")
+    timeline = hours.materialize(2024, resolution=dt.timedelta(minutes=5))
+    data = timeline.to_bytes()
+    assert len(data) < 5 * 2000
+    assert Timeline.from_bytes(data) == timeline
+    assert Timeline.from_bytes(data).resolution == dt.timedelta(minutes=5)
+    with pytest.raises(ValueError):
+        Timeline.from_bytes(b"nope" + data[4:])
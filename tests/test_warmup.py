@@ -0,0 +1,33 @@
+from py_opening_hours import codegen, datetime_utils as dt_utils, settings
+from py_opening_hours.warmup import Warmed, start_warmup, warmup
+
+
+def test_warmup(pittsburgh_location_spec):
+    dt_utils.HOLIDAY_DATES.pop(("US", "PA", 2031), None)
+    codegen.COMPILED.clear()
+    report = warmup(
+        years=[2031],
+        regions=[("US", "PA"), "CA"],
+        locations=[pittsburgh_location_spec],
+        strings=["Mo-Fr 08:00-12:00; PH off", "Sa-Su sunrise-sunset"],
+    )
+    assert report.dates.items == 365
+    assert report.holidays.items == 2
+    assert report.sun.items == 1
+    assert report.strings == Warmed(2, report.strings.seconds)
+    assert report.seconds >= report.sun.seconds
+    assert ("US", "PA", 2031) in dt_utils.HOLIDAY_DATES
+    assert ("CA", None, 2031) in dt_utils.HOLIDAY_DATES
+    assert len(codegen.COMPILED) == 2
+
+
+def test_start_warmup(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_RULE_SEGMENTS", False)
+    monkeypatch.setattr(settings, "PARSE_CACHE_PATH", None)
+    future = start_warmup(years=[2032], strings=["24/7"], compile_rules=False)
+    report = future.result(timeout=60)
+    assert report.dates.items == 366
+    assert report.holidays.items == 1
+    assert report.sun.items == 0
+    # no cache to parse the strings into
+    assert report.strings.items == 0